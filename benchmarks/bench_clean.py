@@ -0,0 +1,98 @@
+# Shows how the vectorized cleaning in clean.py scales compared to the original per-row lambdas and iterrows loop,
+# on synthetic course catalogs (clean_courses) and the semesters of review tables (semester_ordinals)
+#
+# Usage: python benchmarks/bench_clean.py [--courses 1000 10000 100000] [--reviews 100000 1000000 10000000]
+#                                         [--original-limit 1000000]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from omscs_dashboard.clean import clean_courses, semester_ordinals, semester_periods, treemap_label, cap_outliers
+from synthetic import make_courses
+
+
+# The cleaning code as it was in update_page.py before clean.py, for comparison
+def clean_courses_original(raw_df, min_review_count=5):
+    raw_df = raw_df.copy()
+    raw_df['code'] = raw_df['codes'].apply(lambda x: x[0])
+    raw_df['dept'] = raw_df['code'].apply(lambda x: x.split('-')[0])
+    raw_df['tag'] = raw_df['name'].apply(lambda x: ''.join([word[0] for word in x.split() if word[0].isupper()]))
+    for i, row in raw_df.iterrows():
+        if isinstance(row['tags'], list):
+            if len(row['tags']) > 0:
+                raw_df.at[i,'tag'] = row['tags'][0]
+    df = raw_df[raw_df['reviewCount'] >= min_review_count].copy()
+    df = df[['name', 'tag', 'dept', 'code', 'description', 'reviewCount', 'rating', 'difficulty', 'workload']]
+    # (the hard-coded workload of the DC course has since been replaced by the outlier rule of clean.py)
+    df = cap_outliers(df)
+    df['label'] = df['tag'] + '<br><br>' + df['rating'].apply(lambda x:str(round(x, 3)))
+    return df
+
+
+def clean_courses_vectorized(raw_df, min_review_count=5):
+    df = clean_courses(raw_df, min_review_count)
+    df['label'] = treemap_label(df, 'rating')
+    return df
+
+
+# The semester ordinals computed one row at a time, for comparison
+def semester_ordinal(semester):
+    period, _, year = semester.partition(' ')
+    return int(year) * 3 + semester_periods.index(period) if period in semester_periods and year.isdigit() else -1
+
+
+def add_ordinals_original(df):
+    df['ordinal'] = df['semester'].apply(semester_ordinal)
+    return df
+
+
+def add_ordinals_vectorized(df):
+    df['ordinal'] = semester_ordinals(df['semester'])
+    return df
+
+
+def make_semester_table(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    semesters = np.array([period + ' ' + str(year) for year in range(2014, 2024) for period in ['Spring', 'Summer', 'Fall']] + ['All'], dtype=object)
+    return pd.DataFrame({'semester': semesters[rng.integers(0, len(semesters), n_rows)],
+                         'rating': rng.integers(1, 6, n_rows).astype(float)})
+
+
+def timed(function, df):
+    start = time.perf_counter()
+    result = function(df)
+    return result, time.perf_counter() - start
+
+
+def compare(label, n_rows, make_input, original, vectorized, original_limit):
+    df = make_input(n_rows)
+    result, elapsed = timed(vectorized, df.copy())
+    line = '%-20s %10d rows  vectorized %8.3fs (%9.0f rows/s)' % (label, n_rows, elapsed, n_rows / elapsed)
+    if n_rows <= original_limit:
+        expected, elapsed_original = timed(original, df.copy())
+        pd.testing.assert_frame_equal(expected, result, check_dtype=False)
+        line += '  original %8.3fs  speedup x%.0f' % (elapsed_original, elapsed_original / elapsed)
+    print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--reviews', type=int, nargs='+', default=[100000, 1000000, 10000000])
+    parser.add_argument('--original-limit', type=int, default=1000000,
+                        help='only time the original code on inputs up to this many rows')
+    args = parser.parse_args()
+
+    for n_courses in args.courses:
+        compare('clean_courses', n_courses, lambda n: pd.DataFrame(make_courses(n)),
+                clean_courses_original, clean_courses_vectorized, args.original_limit)
+    for n_reviews in args.reviews:
+        compare('semester_ordinals', n_reviews, make_semester_table,
+                add_ordinals_original, add_ordinals_vectorized, args.original_limit)
@@ -0,0 +1,76 @@
+# Compares scraping the course review pages one at a time against the concurrent worker pool in scrape.py
+# A local stub HTTP server stands in for OMS Central and adds a fixed delay to every response to mimic the network
+# (tests/test_scrape.py checks the same against a smaller stub server)
+#
+# Usage: python benchmarks/bench_concurrent_scrape.py [--courses 60] [--delay 0.5] [--workers 1 4 8 16]
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from omscs_dashboard import fetch
+from omscs_dashboard.scrape import scrape_courses
+from synthetic import make_reviews_html
+
+
+def start_stub_server(delay, n_reviews):
+    page = make_reviews_html(n_reviews).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, default=60)
+    parser.add_argument('--reviews', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.5, help='seconds the stub server waits before each response')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    server = start_stub_server(args.delay, args.reviews)
+    base = 'http://127.0.0.1:%d' % server.server_port
+    names = ['Course %d' % i for i in range(args.courses)]
+    urls = [base + '/courses/course-%d/reviews' % i for i in range(args.courses)]
+
+    expected = None
+    baseline = None
+    for workers in args.workers:
+        # (an empty HTTP cache for every run, so that every page is fetched from the stub server)
+        cache = tempfile.TemporaryDirectory()
+        fetch.cache_dir = cache.name
+        start = time.perf_counter()
+        # silence the per-course progress output
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        try:
+            result, failed = scrape_courses(names, urls, max_workers=workers, requests_per_second=None)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        elapsed = time.perf_counter() - start
+        cache.cleanup()
+        if expected is None:
+            expected, baseline = result, elapsed
+        assert not failed and result.equals(expected), 'concurrent scrape returned different data'
+        print('workers=%-3d %7.2fs  speedup x%.1f' % (workers, elapsed, baseline / elapsed))
+
+    server.shutdown()
@@ -0,0 +1,55 @@
+# Compares the single pass review extractor in scrape.py with the original BeautifulSoup tree search,
+# on parse time and peak memory, and checks that both return the same reviews
+#
+# Usage: python benchmarks/bench_parse_reviews.py [--pages 20] [--reviews 200]
+#        python benchmarks/bench_parse_reviews.py --files .http_cache/*.body   (pages saved by earlier runs)
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from omscs_dashboard.scrape import extract_reviews, extract_reviews_soup
+from synthetic import make_reviews_html
+
+
+# Time and peak memory are measured in separate passes, as tracing the allocations slows the parsers down
+def measure(extract, pages):
+    start = time.perf_counter()
+    results = [extract(page) for page in pages]
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    for page in pages:
+        extract(page)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return results, elapsed, peak
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=20, help='number of synthetic pages')
+    parser.add_argument('--reviews', type=int, default=200, help='reviews per synthetic page')
+    parser.add_argument('--files', nargs='*', help='saved review pages to use instead of synthetic ones')
+    args = parser.parse_args()
+
+    if args.files:
+        pages = []
+        for path in args.files:
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+    else:
+        pages = [make_reviews_html(args.reviews, seed=i).encode() for i in range(args.pages)]
+    total_mb = sum(len(page) for page in pages) / 1e6
+    print('%d pages, %.1f MB' % (len(pages), total_mb))
+
+    expected = None
+    for label, extract in [('BeautifulSoup', extract_reviews_soup), ('streaming', extract_reviews)]:
+        results, elapsed, peak = measure(extract, pages)
+        if expected is None:
+            expected = results
+        assert results == expected, label + ' parser returned different reviews'
+        print('%-14s %7.3fs  %6.1f MB/s  peak memory %6.1f MB' % (label, elapsed, total_mb / elapsed, peak / 1e6))
@@ -0,0 +1,142 @@
+# Times every stage of the whole update (fetch, parse, aggregate, store, analytics, render, html) on synthetic
+# OMS Central data at several scales, without network access, and compares the results with a saved baseline
+# For each scale, the landing page and the review pages of every course are generated (see synthetic.py) into a replay
+# archive (see fetch.record_to), and 'python -m omscs_dashboard build --replay' runs on it in a fresh process, so the
+# peak memory of each scale is measured on its own. The per-stage metrics come from metrics.py.
+#
+# Usage: python benchmarks/bench_pipeline.py [--courses 50 500 5000] [--reviews 30] [--figures scatter,semester ...]
+#                                            [--save BASELINE.json] [--baseline BASELINE.json] [--tolerance 0.25]
+# The results are compared with the baseline (benchmarks/baseline.json by default, recorded with the default options
+# on the machine described in it), and the run exits with status 1 if a stage got slower or used more memory than the
+# baseline by more than the tolerance (and 'min_seconds' / 'min_bytes', so that the noise of tiny stages is not
+# reported). If the baseline file does not exist yet, the results are saved as the baseline instead. Timings are only
+# comparable on the same machine: record a baseline of your own with --save before changing anything.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from slugify import slugify
+
+from omscs_dashboard.fetch import archive_name
+from omscs_dashboard.pipeline import landing_url
+from synthetic import make_courses, make_landing_html, make_reviews_html
+
+
+# Differences below these are never reported as regressions
+min_seconds = 0.05
+min_bytes = 20 * 2 ** 20
+
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+# Write a replay archive with a landing page of 'n_courses' courses and 'n_reviews' reviews on each review page
+def write_archive(path, n_courses, n_reviews, seed=0):
+    urls = {}
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        archive.writestr(archive_name(landing_url), make_landing_html(n_courses, seed))
+        urls[archive_name(landing_url)] = landing_url
+        for i, course in enumerate(make_courses(n_courses, seed)):
+            # (the same URL as pipeline.course_table gives the course)
+            url = 'https://www.omscentral.com/courses/' + slugify(course['name']) + '/reviews'
+            archive.writestr(archive_name(url), make_reviews_html(n_reviews, seed=seed + i))
+            urls[archive_name(url)] = url
+        archive.writestr('urls.json', json.dumps(urls, indent=1))
+
+
+# Build the page from the archive in a new process, returns the metrics of each stage (see metrics.summary)
+def run_build(archive_path, workdir, figures, jobs):
+    metrics_path = os.path.join(workdir, 'metrics.json')
+    command = [sys.executable, '-m', 'omscs_dashboard', 'build', '--replay', archive_path, '--force',
+               '--output', os.path.join(workdir, 'page.html'), '--metrics-json', metrics_path, '--jobs', str(jobs)]
+    if figures:
+        command += ['--figures', figures]
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    subprocess.run(command, cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+    with open(metrics_path) as f:
+        return json.load(f)
+
+
+# Per stage: seconds, rows per second and peak memory (RSS of the process at the end of the stage)
+def stage_results(metrics):
+    results = {}
+    for stage, values in metrics['stages'].items():
+        results[stage] = {'wall_seconds': round(values['wall_seconds'], 4),
+                          'cpu_seconds': round(values['cpu_seconds'], 4),
+                          'rows': values['rows'],
+                          'rows_per_second': round(values['rows'] / values['wall_seconds'], 1) if values['wall_seconds'] else None,
+                          'peak_rss_bytes': values['peak_rss_bytes']}
+    results['total'] = {'wall_seconds': round(metrics['total']['wall_seconds'], 4),
+                        'cpu_seconds': round(metrics['total']['cpu_seconds'], 4),
+                        'peak_rss_bytes': metrics['total']['peak_rss_bytes']}
+    return results
+
+
+def print_results(scale, results):
+    print('%s' % scale)
+    print('  %-10s %9s %9s %9s %12s %10s' % ('stage', 'wall (s)', 'cpu (s)', 'rows', 'rows/s', 'rss (MB)'))
+    for stage, values in results.items():
+        rows_per_second = values.get('rows_per_second')
+        print('  %-10s %9.3f %9.3f %9s %12s %10.1f' % (stage, values['wall_seconds'], values['cpu_seconds'],
+                                                      values.get('rows', ''), '%.0f' % rows_per_second if rows_per_second else '',
+                                                      values['peak_rss_bytes'] / 1e6))
+
+
+# The stages of 'results' that are slower or use more memory than in 'baseline' (beyond the tolerance)
+def regressions(results, baseline, tolerance):
+    found = []
+    for scale, stages in results.items():
+        for stage, values in stages.items():
+            before = baseline.get(scale, {}).get(stage)
+            if before is None:
+                continue
+            for key, minimum in [('wall_seconds', min_seconds), ('peak_rss_bytes', min_bytes)]:
+                if values[key] > before[key] * (1 + tolerance) and values[key] - before[key] > minimum:
+                    found.append('%s %s %s: %.4g -> %.4g (%+.0f%%)' % (scale, stage, key, before[key], values[key],
+                                                                        100 * (values[key] / before[key] - 1)))
+    return found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--courses', type=int, nargs='+', default=[50, 500, 5000])
+    parser.add_argument('--reviews', type=int, default=30, help='reviews on the review page of every course')
+    parser.add_argument('--figures', default=None, help='figure groups to build (default: the ones of the page)')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes of the render stage')
+    parser.add_argument('--save', metavar='BASELINE.json', help='save the results as a baseline')
+    parser.add_argument('--baseline', metavar='BASELINE.json', default=default_baseline,
+                        help='compare the results with a saved baseline (created from the results if it does not exist)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative increase reported as a regression')
+    args = parser.parse_args()
+
+    results = {}
+    for n_courses in args.courses:
+        scale = '%d courses x %d reviews' % (n_courses, args.reviews)
+        with tempfile.TemporaryDirectory() as workdir:
+            archive_path = os.path.join(workdir, 'pages.zip')
+            write_archive(archive_path, n_courses, args.reviews)
+            results[scale] = stage_results(run_build(archive_path, workdir, args.figures, args.jobs))
+        print_results(scale, results[scale])
+
+    if not args.save and not os.path.exists(args.baseline):
+        args.save = args.baseline
+        print('No baseline at ' + args.baseline + ', the results are saved as the baseline')
+    if args.save:
+        baseline = {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+                    'courses': args.courses, 'reviews': args.reviews, 'figures': args.figures, 'jobs': args.jobs,
+                    'results': results}
+        with open(args.save, 'w') as f:
+            json.dump(baseline, f, indent=1)
+    else:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f)['results'], args.tolerance)
+        print('\n'.join(['Regressions:'] + found) if found else 'No regressions against ' + args.baseline)
+        sys.exit(1 if found else 0)
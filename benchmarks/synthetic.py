@@ -0,0 +1,68 @@
+# Generates pages shaped like the OMS Central landing and course reviews pages, so the scraping code can be run
+# and timed without hitting the real website
+import json
+import random
+
+
+info_class = 'inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium bg-green-100 text-green-800'
+semester_periods = ['spring', 'summer', 'fall']
+
+
+def make_reviews_html(n_reviews, seed=0):
+    rng = random.Random(seed)
+    items = []
+    for i in range(n_reviews):
+        semester = rng.choice(semester_periods) + ' ' + str(rng.randint(2014, 2023))
+        if rng.random() < 0.02:
+            semester = 'unknown semester'
+        items.append(
+            '<li class="bg-white px-4 py-6 shadow sm:p-6 sm:rounded-lg">'
+            '<div class="flex space-x-3"><p class="text-sm font-medium text-gray-900">Anonymous</p>'
+            '<span class="capitalize">' + semester + '</span></div>'
+            '<div class="mt-2 space-x-2">'
+            '<span class="' + info_class + '">Rating: ' + str(rng.randint(1, 5)) + ' / 5</span>'
+            '<span class="' + info_class + '">Difficulty: ' + str(rng.randint(1, 5)) + ' / 5</span>'
+            '<span class="' + info_class + '">Workload: ' + str(rng.randint(3, 30)) + ' hours / week</span>'
+            '</div>'
+            '<div class="mt-4 space-y-4 text-sm text-gray-700"><p>' + 'Lorem ipsum dolor sit amet. ' * rng.randint(5, 40) + '</p></div>'
+            '</li>'
+        )
+    return ('<!DOCTYPE html><html><head><title>Reviews</title></head><body>'
+            '<nav><ul><li><a href="/">Home</a></li><li><a href="/courses">Courses</a></li></ul></nav>'
+            '<ul role="list" class="space-y-4">' + ''.join(items) + '</ul>'
+            '</body></html>')
+
+
+course_words = ['Machine', 'Learning', 'Computer', 'Vision', 'Graduate', 'Algorithms', 'Software', 'Development',
+                'Process', 'Network', 'Security', 'Artificial', 'Intelligence', 'for', 'and', 'of', 'Data', 'Systems',
+                'Robotics', 'Human', 'Interaction', 'High', 'Performance', 'Computing', 'Distributed', 'Analytics']
+departments = ['CS', 'CSE', 'ISYE', 'MGT', 'PUBP', 'ECE']
+
+
+# Course records shaped like the ones in the landing page's 'courses' list
+def make_courses(n_courses, seed=0):
+    rng = random.Random(seed)
+    courses = []
+    for i in range(n_courses):
+        name = ' '.join(rng.choice(course_words) for _ in range(rng.randint(2, 5))) + ' ' + str(i)
+        code = rng.choice(departments) + '-' + str(6000 + i)
+        courses.append({
+            'name': name,
+            'codes': [code],
+            'tags': [] if rng.random() < 0.5 else [''.join(w[0] for w in name.split() if w[0].isupper()) + str(i)],
+            'description': 'Lorem ipsum dolor sit amet. ' * rng.randint(5, 20),
+            'reviewCount': rng.randint(0, 400),
+            'rating': round(rng.uniform(1, 5), 4),
+            'difficulty': round(rng.uniform(1, 5), 4),
+            'workload': round(rng.uniform(3, 30), 4),
+        })
+    return courses
+
+
+# Landing page with the Next.js data blob that pipeline.load_courses reads the course list from
+def make_landing_html(n_courses, seed=0):
+    courses = make_courses(n_courses, seed)
+    data = {'props': {'pageProps': {'courses': courses}}, 'page': '/'}
+    return ('<!DOCTYPE html><html><head><title>OMSCentral</title></head><body><div id="__next"></div>'
+            '<script id="__NEXT_DATA__" type="application/json">' + json.dumps(data) + '</script>'
+            '</body></html>')
@@ -0,0 +1,4 @@
+# Georgia Tech OMSCS course rating and difficulty dashboard
+# Scrapes the course reviews of OMS Central and generates a page of Plotly figures summarizing them.
+# Run 'python -m omscs_dashboard build --help' for the command line options (see cli.py), the stages of the update are
+# in pipeline.py and the figures in figures.py.
@@ -0,0 +1,117 @@
+# Streaming per-semester aggregation of the course reviews
+# Running counts, means and sums of squared deviations (Welford / Chan et al.) are kept per (course, semester) in compact
+# numpy arrays and updated as each review page is parsed, so no per-course DataFrames are built and concatenated.
+# A histogram of the (integer) scores per (course, semester) gives the median without keeping the reviews around.
+import numpy as np
+import pandas as pd
+
+from .clean import sort_semesters
+
+
+metrics = ['rating', 'difficulty', 'workload']
+
+# Columns of the aggregated table, in order, after the (name, semester) index
+aggregate_columns = metrics + ['reviewCount'] + [metric + '_var' for metric in metrics] + [metric + '_median' for metric in metrics]
+
+# Scores are counted in integer bins from 0 to hist_bins - 1 (ratings and difficulties are 1-5, workloads in hours per week,
+# anything above is counted in the last bin, which only makes the median approximate for extreme workloads)
+hist_bins = 101
+
+
+class SemesterAggregator:
+    def __init__(self, capacity=256):
+        self.keys = {}  # (name, semester) -> row in the arrays below
+        self.course_rows = {}  # name -> rows of its semesters
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.mean = np.zeros((capacity, len(metrics)))
+        self.m2 = np.zeros((capacity, len(metrics)))
+        self.hist = np.zeros((capacity, len(metrics), hist_bins), dtype=np.int32)
+
+    def row(self, key):
+        if key not in self.keys:
+            if len(self.keys) == len(self.count):
+                self.grow()
+            self.keys[key] = len(self.keys)
+            self.course_rows.setdefault(key[0], []).append(self.keys[key])
+        return self.keys[key]
+
+    # double the capacity of all the arrays
+    def grow(self):
+        capacity = 2 * len(self.count)
+        for attr in ['count', 'mean', 'm2', 'hist']:
+            old = getattr(self, attr)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, attr, new)
+
+    # Add the (semester, rating, difficulty, workload) tuples of one course
+    # The batch is summarised per semester and merged into the running accumulators with the parallel variant of
+    # Welford's algorithm, which gives the same result as adding the reviews one by one
+    def add_reviews(self, name, reviews):
+        if not reviews:
+            return
+        semesters, values = zip(*((review[0], review[1:]) for review in reviews))
+        values = np.array(values, dtype=float)
+        uniques, inverse = np.unique(semesters, return_inverse=True)
+        rows = np.array([self.row((name, semester)) for semester in uniques])
+
+        n = np.bincount(inverse, minlength=len(uniques))
+        means = np.stack([np.bincount(inverse, values[:, j], len(uniques)) for j in range(len(metrics))], axis=1) / n[:, None]
+        squared_deviations = (values - means[inverse]) ** 2
+        m2 = np.stack([np.bincount(inverse, squared_deviations[:, j], len(uniques)) for j in range(len(metrics))], axis=1)
+
+        n_old = self.count[rows]
+        total = n_old + n
+        delta = means - self.mean[rows]
+        self.mean[rows] += delta * (n / total)[:, None]
+        self.m2[rows] += m2 + delta ** 2 * (n_old * n / total)[:, None]
+        self.count[rows] = total
+
+        bins = np.clip(np.rint(values), 0, hist_bins - 1).astype(np.intp)
+        for j in range(len(metrics)):
+            np.add.at(self.hist[:, j, :], (rows[inverse], bins[:, j]), 1)
+
+    # The aggregated table, indexed by name and semester (in the order the courses were added, semesters sorted)
+    # If 'names' is given, only the rows of these courses, in the order of 'names'
+    def to_frame(self, names=None):
+        keys = list(self.keys)
+        if names is None:
+            rows = np.arange(len(keys))
+        else:
+            rows = np.array([row for name in dict.fromkeys(names) for row in self.course_rows.get(name, [])], dtype=np.intp)
+            keys = [keys[row] for row in rows]
+        size = len(rows)
+        count = self.count[rows]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.where(count[:, None] > 1, self.m2[rows] / (count[:, None] - 1), np.nan)
+
+        # median: middle of the two central reviews, found from the cumulative histogram
+        cumulative = self.hist[rows].cumsum(axis=2)
+        lower = (cumulative >= ((count + 1) // 2)[:, None, None]).argmax(axis=2)
+        upper = (cumulative >= (count // 2 + 1)[:, None, None]).argmax(axis=2)
+        median = (lower + upper) / 2
+
+        index = pd.MultiIndex.from_tuples(keys, names=['name', 'semester'])
+        if not size:
+            index = pd.MultiIndex.from_arrays([[], []], names=['name', 'semester'])
+        columns = np.hstack([self.mean[rows], count[:, None], var, median])
+        df = pd.DataFrame(columns, index=index, columns=aggregate_columns)
+        df['reviewCount'] = count
+        return df
+
+
+# The scores of the reviews are whole numbers: ratings and difficulties from 1 to 5, workloads in hours per week
+score_types = {'rating': 'int8', 'difficulty': 'int8', 'workload': 'int16'}
+
+
+# The table of the individual reviews in 'reviews' (course name -> list of (semester, rating, difficulty, workload) tuples)
+# with categorical course names (in the order of 'names') and semesters (in chronological order), sorted by course and
+# then by semester, so the reviews of each course and of each (course, semester) are contiguous
+def review_table(reviews, names):
+    names = list(names)
+    records = [(name,) + tuple(review) for name in names for review in reviews.get(name, [])]
+    df = pd.DataFrame(records, columns=['name', 'semester'] + metrics)
+    df['name'] = pd.Categorical(df['name'], categories=names)
+    df['semester'] = pd.Categorical(df['semester'], categories=sort_semesters(df['semester']), ordered=True)
+    df = df.astype(score_types)
+    return df.sort_values(['name', 'semester'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,169 @@
+# Estimates that stay meaningful for courses and semesters with only a few reviews
+# For every course, and every (course, semester), and each score:
+#     <score>_mean                         the plain mean of the reviews
+#     <score>_low, <score>_high            bootstrap percentile confidence interval of the mean
+#     <score>_shrunk                       Bayesian average: the mean pulled towards a prior mean, more so with fewer reviews
+#     <score>_shrunk_low, _shrunk_high     the confidence interval of the Bayesian average
+# The prior of a course is the mean of all the reviews, the prior of a (course, semester) is the mean of the course.
+# The weight of the prior (in number of reviews) is estimated from the data (empirical Bayes, method of moments): the
+# more the group means vary beyond what their number of reviews explains, the less they are shrunk.
+#
+# The bootstrap resamples every group at once with numpy: the reviews are sorted by group, each resample draws, for every
+# review slot, a random review of the same group, and np.add.reduceat sums the draws of each group. The scores are whole
+# numbers, so the sums are exact integers: the scores of each review are packed into one 64 bit integer (each with
+# enough bits for the sum of the largest group), so that one gather and one reduceat sum all the scores of all the
+# groups of a block, and the quantiles are taken from the sorted integer sums. The groups are processed in blocks of at
+# most 'max_sums' sums (groups x scores x resamples), and the resamples of each block in chunks of at most
+# 'max_elements' draws.
+import numpy as np
+import pandas as pd
+
+from .aggregate import metrics
+
+
+n_resamples = 10000
+confidence = 0.9
+
+# Maximum number of random draws (resamples x reviews) held in memory at once
+max_elements = 2 ** 20
+
+# Maximum number of resampled sums (groups x scores x resamples) held in memory at once
+max_sums = 2 ** 22
+
+# Fixed seed, so that the same reviews always give the same intervals (and the same page)
+seed = 0
+
+
+# The columns of 'values' (whole numbers) minus their minimum, packed into as few 64 bit integer columns as possible,
+# with enough bits for each to add up 'max_count' of them: returns the minimums, the packed columns, and for each packed
+# column the (column, shift, bits) of the columns in it
+def pack_columns(values, max_count):
+    minimums = values.min(axis=0)
+    shifted = (values - minimums).astype(np.int64)
+    packs = [[]]
+    used = 0
+    for j in range(values.shape[1]):
+        bits = (int(shifted[:, j].max()) * int(max_count)).bit_length()
+        if packs[-1] and used + bits > 63:
+            packs.append([])
+            used = 0
+        packs[-1].append((j, used, bits))
+        used += bits
+    packed = [np.bitwise_or.reduce([shifted[:, j] << shift for j, shift, bits in pack]) for pack in packs]
+    return minimums, packed, packs
+
+
+# Bootstrap percentile intervals of the means of contiguous groups of rows of 'values' (reviews x scores, whole numbers)
+# 'counts' is the number of rows of each group, in order. Returns the low and high bounds (groups x scores).
+def bootstrap_intervals(values, counts, n_resamples=n_resamples, confidence=confidence, rng=None):
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    values = np.asarray(values)
+    if not np.array_equal(values, np.rint(values)):
+        raise ValueError('the scores must be whole numbers')
+    values = np.rint(values).astype(np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    n_groups, n_scores = len(counts), values.shape[1]
+    low = np.empty((n_groups, n_scores))
+    high = np.empty_like(low)
+    if not n_groups:
+        return low, high
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    # (every resample of a single review is that review, only the larger groups are resampled)
+    single = counts == 1
+    if single.any():
+        low[single] = high[single] = values[starts[single]]
+        if not single.all():
+            low[~single], high[~single] = bootstrap_intervals(values[np.repeat(~single, counts)], counts[~single],
+                                                              n_resamples, confidence, rng)
+        return low, high
+    minimums, packed, packs = pack_columns(values, counts.max())
+    sum_type = np.int32 if max(bits for pack in packs for j, shift, bits in pack) < 32 else np.int64
+    # the resamples whose sums are the bounds (interpolated linearly between two of them, like np.quantile)
+    positions = np.array([(1 - confidence) / 2, (1 + confidence) / 2]) * (n_resamples - 1)
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, n_resamples - 1)
+    fractions = positions - below
+
+    block_size = max(max_sums // (n_scores * n_resamples), 1)
+    for first in range(0, n_groups, block_size):
+        last = min(first + block_size, n_groups)
+        block_counts = counts[first:last]
+        block_starts = starts[first:last] - starts[first]
+        block_packed = [column[starts[first]:ends[last - 1]] for column in packed]
+        # for each review slot of the block, the first row and the number of rows of its group
+        slot_starts = np.repeat(block_starts, block_counts)
+        slot_counts = np.repeat(block_counts, block_counts).astype(np.uint64)
+
+        sums = np.empty((last - first, n_scores, n_resamples), dtype=sum_type)
+        chunk = max(max_elements // len(slot_starts), 1)
+        for resample in range(0, n_resamples, chunk):
+            size = min(chunk, n_resamples - resample)
+            # a random 32 bit integer times the size of the group, divided by 2^32, is a random row of the group
+            # (half as many raw 64 bit numbers as draws, which is much faster than drawing floats or bounded integers)
+            raw = rng.bit_generator.random_raw((size * len(slot_starts) + 1) // 2).view(np.uint32)
+            draws = raw[:size * len(slot_starts)].reshape(size, -1) * slot_counts
+            draws >>= np.uint64(32)
+            draws = draws.view(np.int64)
+            draws += slot_starts
+            for column, pack in zip(block_packed, packs):
+                totals = np.add.reduceat(column[draws], block_starts, axis=1)
+                for j, shift, bits in pack:
+                    sums[:, j, resample:resample + size] = ((totals >> shift) & ((1 << bits) - 1)).T
+        # (sorting the integer sums is faster than np.partition)
+        sums.sort(axis=2)
+        bounds = sums[:, :, below] + fractions * (sums[:, :, above] - sums[:, :, below])
+        bounds = bounds / block_counts[:, None, None] + minimums[None, :, None]
+        low[first:last], high[first:last] = bounds[:, :, 0], bounds[:, :, 1]
+    return low, high
+
+
+# Weight of the prior, in number of reviews, for groups with the given counts, means and variances (groups x scores)
+# shrunk towards 'prior_means': the ratio of the variance of single reviews (within the groups) to the variance of the
+# true group means around their priors (the variance of the observed means minus the part due to the number of reviews)
+def prior_weight(counts, means, variances, prior_means):
+    counts = counts[:, None]
+    within = np.nansum((counts - 1) * variances, axis=0) / max(np.sum(counts - 1), 1)
+    between = np.mean((means - prior_means) ** 2 - within / counts, axis=0)
+    return within / np.maximum(between, 1e-6)
+
+
+# Bayesian average of groups with the given counts and means, shrunk towards 'prior_means' with the given prior weight
+def shrink(counts, means, prior_means, weight):
+    counts = counts[:, None]
+    return (counts * means + weight * prior_means) / (counts + weight)
+
+
+# Estimates for the groups of rows of 'reviews_df' (see aggregate.review_table) with the same 'keys', shrunk towards
+# 'prior_means' (groups x scores), as a DataFrame indexed by 'keys'
+def group_estimates(reviews_df, keys, prior_means, n_resamples=n_resamples, confidence=confidence):
+    grouped = reviews_df.groupby(keys, observed=True, sort=False)
+    counts = grouped.size().to_numpy()
+    means = grouped[metrics].mean().to_numpy()
+    variances = grouped[metrics].var().to_numpy()
+    low, high = bootstrap_intervals(reviews_df[metrics].to_numpy(), counts, n_resamples, confidence)
+    weight = prior_weight(counts, means, variances, prior_means)
+
+    columns = {'reviews': counts}
+    for j, metric in enumerate(metrics):
+        columns[metric + '_mean'] = means[:, j]
+        columns[metric + '_low'] = low[:, j]
+        columns[metric + '_high'] = high[:, j]
+        for suffix, values in [('', means), ('_low', low), ('_high', high)]:
+            # (the Bayesian average is an increasing function of the mean, so its interval is the transformed interval)
+            columns[metric + '_shrunk' + suffix] = shrink(counts, values[:, [j]], prior_means[:, [j]], weight[j])[:, 0]
+    return pd.DataFrame(columns, index=grouped.size().index)
+
+
+# Estimates per course, shrunk towards the mean of all the reviews
+def course_estimates(reviews_df, n_resamples=n_resamples, confidence=confidence):
+    n_courses = reviews_df['name'].nunique()
+    prior_means = np.tile(reviews_df[metrics].mean().to_numpy(), (n_courses, 1))
+    return group_estimates(reviews_df, ['name'], prior_means, n_resamples, confidence)
+
+
+# Estimates per (course, semester), shrunk towards the mean of the course (from course_estimates)
+def semester_estimates(reviews_df, course_df, n_resamples=n_resamples, confidence=confidence):
+    keys = reviews_df[['name', 'semester']].drop_duplicates()
+    prior_means = course_df.loc[keys['name'], [metric + '_mean' for metric in metrics]].to_numpy()
+    return group_estimates(reviews_df, ['name', 'semester'], prior_means, n_resamples, confidence)
@@ -0,0 +1,87 @@
+# Data cleaning of the course list and of the semesters of the reviews
+# Everything here works on whole columns at once (no per-row Python lambdas or iterrows loops),
+# so it keeps up when fed much larger course catalogs or historical dumps of reviews
+import numpy as np
+import pandas as pd
+
+
+course_columns = ['name', 'tag', 'dept', 'code', 'description', 'reviewCount', 'rating', 'difficulty', 'workload']
+
+semester_periods = ['Spring', 'Summer', 'Fall']
+
+# Course averages above the upper far-out fence of Tukey's rule (third quartile + 3 interquartile ranges) are outliers
+# that would squash every other course into a corner of the plots (like the workload of Distributed Computing)
+outlier_columns = ['workload']
+outlier_fence = 3
+
+
+# Generate own tag using first letter of each capitalized word in the name as some courses are without tags
+def name_initials(names):
+    initials = names.str.split().explode().str[0]
+    initials = initials[initials.str.isupper().fillna(False).astype(bool)]
+    return initials.groupby(level=0).sum().reindex(names.index, fill_value='')
+
+
+# Turn the raw course list from OMS Central into the cleaned table used for plotting
+# (courses with fewer than 'min_review_count' reviews are filtered out)
+def clean_courses(raw_df, min_review_count=5):
+    raw_df = raw_df.reset_index(drop=True)
+
+    # The 'codes' column of the courses consists of lists instead of strings, extract the first element of the list.
+    code = raw_df['codes'].str[0]
+
+    # The first part of the course code (before the - sign) can be extracted as the department.
+    dept = code.str.extract(r'^([^-]*)', expand=False)
+
+    # Some courses already have tags stored in the form of a list, for simplicity, extract the first element of the list as the tag
+    # the other courses get a tag made of the initials of their name
+    tag = raw_df['tags'].str[0].fillna(name_initials(raw_df['name']))
+
+    df = raw_df.assign(code=code, dept=dept, tag=tag)
+    df = df.loc[df['reviewCount'] >= min_review_count, course_columns].copy()
+
+    # More data cleaning
+    return cap_outliers(df)
+
+
+# Replace the outliers of 'columns' (see outlier_fence) with the highest value that is not an outlier
+def cap_outliers(df, columns=outlier_columns, fence=outlier_fence):
+    for column in columns:
+        q1, q3 = df[column].quantile([0.25, 0.75])
+        is_outlier = df[column] > q3 + fence * (q3 - q1)
+        df.loc[is_outlier, column] = df.loc[~is_outlier, column].max()
+    return df
+
+
+# The distinct values of 'semesters' in chronological order, sorted the same way as the semester plots
+def sort_semesters(semesters):
+    uniques = pd.unique(pd.Series(semesters, dtype=object).dropna())
+    return uniques[np.argsort(semester_ordinals(uniques), kind='stable')].tolist()
+
+
+# Integer that orders semesters chronologically: year * 3 + 0 for Spring, 1 for Summer and 2 for Fall
+# ('All' and anything that is not a semester give -1), so semester ranges are simple comparisons
+# There are only a few dozen distinct semesters, so the strings are split once per distinct value and mapped back by code
+def semester_ordinals(semesters):
+    codes, uniques = pd.factorize(pd.Series(semesters, dtype=object))
+    # a trailing missing value, so that missing semesters (code -1) give -1 as well
+    # (without any semester string, partition gives no columns at all)
+    parts = pd.Series(list(uniques) + [None], dtype=object).str.partition(' ').reindex(columns=range(3))
+    periods = parts[0].map({period: i for i, period in enumerate(semester_periods)}).fillna(-1).to_numpy(np.int64)
+    years = pd.to_numeric(parts[2], errors='coerce')
+    ordinals = np.where((periods >= 0) & years.notna(), years.fillna(0) * 3 + periods, -1).astype(np.int64)
+    return ordinals[codes]
+
+
+# The semester names of semester_ordinals(), e.g. 'Fall 2019' ('All' for -1)
+def semester_names(ordinals):
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    names = np.char.add(np.char.add(np.array(semester_periods)[ordinals % 3], ' '), (ordinals // 3).astype(str))
+    return np.where(ordinals >= 0, names, 'All').astype(object)
+
+
+# Label shown in each box of the treemaps: the course tag and the value of 'column' rounded to 3 decimals
+# (formatting with '%.3f' rounds exactly like Python's round(), unlike Series.round which can be off by one in the last digit)
+def treemap_label(df, column):
+    rounded = pd.Series(np.char.mod('%.3f', df[column].to_numpy()), index=df.index).astype(float)
+    return df['tag'] + '<br><br>' + rounded.astype(str)
@@ -0,0 +1,77 @@
+# Command line interface of the dashboard:
+#     python -m omscs_dashboard build [--no-semester] [--figures scatter,treemap] [--output page.html] ...
+#     python -m omscs_dashboard commit-hash
+#     python -m omscs_dashboard serve [--port 8050] [--refresh 1800] ...
+# Only the argument parsing happens here, the stages of the update are in pipeline.py and the server in server.py.
+import argparse
+
+from .figures import figure_groups, default_figures, semester_groups
+from .pipeline import build, commit_hash, default_output, default_export_dir
+from .server import serve, default_host, default_port, default_refresh_seconds
+
+
+# Comma separated list of figure groups, e.g. 'scatter,treemap'
+def figure_list(text):
+    figures = [group.strip() for group in text.split(',') if group.strip()]
+    unknown = [group for group in figures if group not in figure_groups]
+    if unknown:
+        raise argparse.ArgumentTypeError('unknown figures: ' + ', '.join(unknown) + ' (choose from ' + ', '.join(figure_groups) + ')')
+    return figures
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='python -m omscs_dashboard', description='OMSCS course rating and difficulty dashboard')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='scrape OMS Central and generate the course rating and difficulty page')
+    build_parser.add_argument('--figures', type=figure_list, default=default_figures,
+                       help='comma separated figures to put on the page, from ' + ', '.join(figure_groups) + ' (default: ' + ','.join(default_figures) + ')')
+    build_parser.add_argument('--no-semester', action='store_true', help='leave out the plots by semester, so the review page of each course is not scraped')
+    mode = build_parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', metavar='ARCHIVE', help='save every fetched page into ARCHIVE (a zip file)')
+    mode.add_argument('--replay', metavar='ARCHIVE', help='use the pages saved in ARCHIVE instead of fetching them')
+    build_parser.add_argument('--output', default=default_output, help='html file to write')
+    build_parser.add_argument('--precompress', nargs='*', choices=['gzip', 'br'], default=[], help='also write gzip (.gz) and/or brotli (.br) compressed copies of the html file')
+    build_parser.add_argument('--lazy-frames', action='store_true', help='write the frames of the semester animations to a folder next to the html file, loaded by the page when needed')
+    build_parser.add_argument('--force', action='store_true', help='build the page even if the data has not changed since the last run')
+    build_parser.add_argument('--jobs', type=int, metavar='N', help='number of processes building the figures (default: one per figure group, up to the number of CPUs, 1 builds them in this process)')
+    build_parser.add_argument('--export', nargs='?', const=default_export_dir, metavar='DIR', help='also export every review and the course table as Parquet and CSV.gz files, with indexes, to DIR (default: ' + default_export_dir + ')')
+    build_parser.add_argument('--metrics-json', metavar='PATH', help='write the metrics of each stage (and of each scraped course) to PATH as JSON')
+    build_parser.add_argument('--metrics-prometheus', metavar='PATH', help='write the metrics of each stage to PATH in the Prometheus textfile format')
+    build_parser.add_argument('--defer-hash', action='store_true', help='only record the hash of the data as pending, until the commit-hash command records it once the page is published')
+
+    commands.add_parser('commit-hash', help='record the hash of the data of the page built with build --defer-hash, once it is published')
+
+    serve_parser = commands.add_parser('serve', help='serve the dashboard with filters over HTTP, refreshing the data in the background')
+    serve_parser.add_argument('--figures', type=figure_list, default=default_figures,
+                       help='comma separated figures to serve, from ' + ', '.join(figure_groups) + ' (default: ' + ','.join(default_figures) + ')')
+    serve_parser.add_argument('--no-semester', action='store_true', help='leave out the plots by semester, so the review page of each course is not scraped')
+    serve_parser.add_argument('--host', default=default_host, help='address to listen on (default: ' + default_host + ')')
+    serve_parser.add_argument('--port', type=int, default=default_port, help='port to listen on (default: ' + str(default_port) + ')')
+    serve_parser.add_argument('--refresh', type=float, default=default_refresh_seconds, metavar='SECONDS', help='seconds between two refreshes of the data (default: ' + str(default_refresh_seconds) + ')')
+    serve_parser.add_argument('--replay', metavar='ARCHIVE', help='use the pages saved in ARCHIVE (see build --record) instead of fetching them')
+    return parser
+
+
+def selected_figures(parser, args):
+    figures = args.figures
+    if args.no_semester:
+        figures = [group for group in figures if group not in semester_groups]
+    if not figures:
+        parser.error('no figures to build')
+    return figures
+
+
+# Returns the exit status of the command
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        figures = selected_figures(parser, args)
+        return build(figures, args.output, args.record, args.replay, args.precompress, args.lazy_frames, args.force,
+                     args.jobs, args.export, args.metrics_json, args.metrics_prometheus, args.defer_hash)
+    if args.command == 'commit-hash':
+        return commit_hash()
+    if args.command == 'serve':
+        return serve(selected_figures(parser, args), args.host, args.port, args.refresh, args.replay)
@@ -0,0 +1,96 @@
+# Export of the scraped data for analyses outside of the dashboard, without scraping OMS Central again.
+# Every table is written to the export folder both as Parquet (typed, compressed, for pandas / pyarrow / DuckDB...) and
+# as a compact CSV.gz:
+#     reviews                one row per review: name, semester, rating, difficulty, workload
+#     courses                the course table of the page (one row per course)
+#     course_index           per course: first row and number of rows of its reviews in 'reviews', and summary statistics
+#     course_semester_index  the same per course and semester
+#     semester_index         per semester: number of courses and reviews, and summary statistics
+# The reviews are sorted by course (in the order of the course table) and then chronologically by semester, so the
+# reviews of a course, or of a course in one semester, are one contiguous range of rows. load_reviews() uses the indexes
+# to read only the Parquet row groups holding that range instead of the whole file.
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .aggregate import metrics, review_table
+from .pipeline import default_export_dir as export_dir
+
+
+# Rows per Parquet row group of the reviews table (the smallest unit read by load_reviews)
+row_group_size = 16384
+
+
+def course_export_table(df_plot):
+    df = df_plot[['name', 'tag', 'dept', 'code', 'description', 'reviewCount'] + metrics + ['reviewsURL']]
+    return df.astype({'dept': 'category', 'reviewCount': 'int32'} | {metric: 'float32' for metric in metrics}).reset_index(drop=True)
+
+
+# Number of reviews, mean and standard deviation of the scores for each group of 'keys'
+# With 'rows', also the first row and number of rows of each group in 'reviews_df' (the groups must be contiguous)
+def summary_index(reviews_df, keys, rows=False):
+    grouped = reviews_df.groupby(keys, observed=True, sort=False)
+    summary = grouped[metrics].agg(['mean', 'std']).astype('float32')
+    summary.columns = [metric + '_' + statistic for metric, statistic in summary.columns]
+    count = grouped.size()
+    summary.insert(0, 'reviews', count.astype('int32'))
+    if rows:
+        summary.insert(0, 'first_row', (count.cumsum() - count).astype('int64'))
+    if keys == ['semester']:
+        summary.insert(0, 'courses', grouped['name'].nunique().astype('int32'))
+        summary = summary.sort_index()
+    return summary.reset_index()
+
+
+def write_parquet(df, path, **options):
+    tmp_path = path + '.tmp'
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path, compression='zstd', **options)
+    os.replace(tmp_path, path)
+
+
+def write_csv(df, path):
+    tmp_path = path + '.tmp'
+    df.to_csv(tmp_path, index=False, float_format='%.6g', compression={'method': 'gzip', 'mtime': 0})
+    os.replace(tmp_path, path)
+
+
+# Write the review-level table of 'reviews' (see review_table), the course table and the indexes to 'root'
+def write_export(df_plot, reviews, root=export_dir):
+    reviews_df = review_table(reviews, df_plot['name'])
+    tables = {
+        'reviews': reviews_df,
+        'courses': course_export_table(df_plot),
+        'course_index': summary_index(reviews_df, ['name'], rows=True),
+        'course_semester_index': summary_index(reviews_df, ['name', 'semester'], rows=True),
+        'semester_index': summary_index(reviews_df, ['semester']),
+    }
+    os.makedirs(root, exist_ok=True)
+    for table_name, df in tables.items():
+        write_parquet(df, os.path.join(root, table_name + '.parquet'), row_group_size=row_group_size)
+        write_csv(df, os.path.join(root, table_name + '.csv.gz'))
+    return reviews_df
+
+
+# The reviews of course 'name' (only the ones of 'semester' if given) from the export in 'root', as a DataFrame
+# The row range is looked up in the (small) index, and only the row groups of the reviews file that overlap it are read
+def load_reviews(name, semester=None, root=export_dir):
+    if semester is None:
+        index = pq.read_table(os.path.join(root, 'course_index.parquet'), filters=[('name', '==', name)])
+    else:
+        index = pq.read_table(os.path.join(root, 'course_semester_index.parquet'),
+                              filters=[('name', '==', name), ('semester', '==', semester)])
+    reviews_file = pq.ParquetFile(os.path.join(root, 'reviews.parquet'))
+    if not index.num_rows:
+        return reviews_file.schema_arrow.empty_table().to_pandas()
+    first_row, n_rows = index['first_row'][0].as_py(), index['reviews'][0].as_py()
+
+    row_groups, groups_first_row, start = [], None, 0
+    for i in range(reviews_file.num_row_groups):
+        end = start + reviews_file.metadata.row_group(i).num_rows
+        if start < first_row + n_rows and end > first_row:
+            row_groups.append(i)
+            groups_first_row = start if groups_first_row is None else groups_first_row
+        start = end
+    table = reviews_file.read_row_groups(row_groups).slice(first_row - groups_first_row, n_rows)
+    return table.to_pandas()
@@ -0,0 +1,317 @@
+# Shared HTTP layer for downloading pages from OMS Central
+# - keeps connections to each host open and reuses them across requests (connection pooling / keep-alive)
+# - asks for gzip (and brotli when available) compressed responses
+# - keeps a local copy of every page and revalidates it with If-None-Match / If-Modified-Since,
+#   so pages that have not changed come back as an empty 304 response
+# - retries failed requests with exponential backoff
+# - adapts the request rate to each host: speeds up while requests succeed, slows down and pauses when rate limited
+# - counts cache hits, 304s and bytes transferred in 'stats'
+# - can record every fetched page into a zip archive, and later replay the pages from it without any network access
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import atexit
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import zipfile
+
+import urllib3
+
+# for counting the bytes fetched in each stage of the update
+from . import metrics
+
+try:
+    import brotli  # noqa: F401 (urllib3 decodes brotli responses when this is installed)
+    accept_encoding = 'gzip, br'
+except ImportError:
+    accept_encoding = 'gzip'
+
+
+headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:20.0) Gecko/20100101 Firefox/20.0',
+           'Accept-Encoding': accept_encoding}
+
+# Folder with the local copies of the fetched pages (None to disable the cache)
+cache_dir = '.http_cache'
+
+# A failed request is retried up to 'max_retries' times, waiting backoff_base * 2^attempt seconds (plus jitter) in between
+max_retries = 5
+backoff_base = 1
+backoff_max = 60
+
+# Server errors and rate limiting responses that are worth retrying
+retry_statuses = {429, 500, 502, 503, 504}
+
+# Responses that mean the server wants fewer requests, which slow down every request to the host (see HostRateLimiter)
+throttle_statuses = {429, 503}
+
+# Adaptive rate of requests to a host (AIMD): every successful request adds rate_increase / rate, so the rate grows by
+# about 'rate_increase' requests per second every second, and a throttled request multiplies it by 'rate_decrease'
+# (only once every 'decrease_interval' seconds, as the requests already sent at the old rate are often throttled too)
+rate_increase = 1
+rate_decrease = 0.5
+decrease_interval = 1
+min_requests_per_second = 0.2
+
+# retries are handled in fetch() below, urllib3 itself only follows redirects
+http = urllib3.PoolManager(num_pools=4, maxsize=16, timeout=urllib3.Timeout(connect=10, read=60),
+                           retries=urllib3.Retry(total=None, connect=0, read=0, status=0, other=0, redirect=5))
+
+stats = {'requests': 0, 'cache_hits': 0, 'not_modified': 0, 'retries': 0, 'bytes_transferred': 0, 'replayed': 0}
+stats_lock = threading.Lock()
+
+# Zip archive the pages are recorded into or replayed from (see record_to / replay_from)
+archive = None
+archive_mode = None
+archive_urls = {}
+archive_lock = threading.Lock()
+
+
+class FetchError(Exception):
+    pass
+
+
+# Spaces out requests to the same host so that at most 'requests_per_second' are started every second,
+# no matter how many worker threads are waiting to send one
+# The rate starts at 'requests_per_second' and adapts to the host (additive increase, multiplicative decrease) between
+# min_requests_per_second and 'max_requests_per_second' (by default, it stays at 'requests_per_second'). When the host
+# asks to wait (Retry-After), no request is sent to it by any thread until then.
+class HostRateLimiter:
+    def __init__(self, requests_per_second, max_requests_per_second=None):
+        self.initial_rate = requests_per_second
+        self.max_rate = max(max_requests_per_second or requests_per_second or 0, requests_per_second or 0)
+        self.rates = {}
+        self.next_slot = {}
+        self.last_decrease = {}
+        self.lock = threading.Lock()
+
+    def rate(self, host):
+        return self.rates.get(host, self.initial_rate)
+
+    def wait(self, url):
+        if not self.initial_rate:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + 1 / self.rate(host)
+        if slot > now:
+            time.sleep(slot - now)
+
+    # a request to the host of 'url' succeeded
+    def succeeded(self, url):
+        if not self.initial_rate:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            rate = self.rate(host)
+            self.rates[host] = min(self.max_rate, rate + rate_increase / rate)
+
+    # the host of 'url' rate limited a request, and asked to wait 'delay' seconds before the next one
+    def throttled(self, url, delay=0):
+        if not self.initial_rate:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            if now >= self.last_decrease.get(host, now - decrease_interval) + decrease_interval:
+                self.rates[host] = max(min_requests_per_second, self.rate(host) * rate_decrease)
+                self.last_decrease[host] = now
+            self.next_slot[host] = max(self.next_slot.get(host, now), now + delay)
+
+
+def count(key, amount=1):
+    with stats_lock:
+        stats[key] += amount
+
+
+def reset_stats():
+    with stats_lock:
+        for key in stats:
+            stats[key] = 0
+
+
+def cache_paths(url):
+    key = hashlib.sha256(url.encode()).hexdigest()
+    return os.path.join(cache_dir, key + '.json'), os.path.join(cache_dir, key + '.body')
+
+
+def load_cached(url):
+    if not cache_dir:
+        return None, None
+    meta_path, body_path = cache_paths(url)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+
+# Store the page body and its validators, 'body' is None when only the validators of a 304 response need updating
+def save_cached(url, response, body, meta=None):
+    if not cache_dir:
+        return
+    meta = meta or {}
+    meta = {'url': url,
+            'etag': response.headers.get('ETag', meta.get('etag')),
+            'last_modified': response.headers.get('Last-Modified', meta.get('last_modified')),
+            'fetched_at': time.time(), 'max_age': max_age(response)}
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path, body_path = cache_paths(url)
+    files = [(meta_path, json.dumps(meta), 'w')]
+    if body is not None:
+        files.insert(0, (body_path, body, 'wb'))
+    # write to temporary files first so a concurrent or interrupted run never sees half a page
+    for path, data, mode in files:
+        tmp_path = path + '.' + str(threading.get_ident()) + '.tmp'
+        with open(tmp_path, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+# Number of seconds the server allows the page to be reused without revalidating it, from the Cache-Control header
+def max_age(response):
+    cache_control = response.headers.get('Cache-Control', '')
+    if 'no-cache' in cache_control or 'no-store' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    return int(match.group(1)) if match else 0
+
+
+# Number of seconds the server asks us to wait before trying again, from the Retry-After header
+def retry_after(response):
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Seconds to wait before retrying after 'attempt' failed attempts: what the server asked for, or exponential backoff
+# (never more than backoff_max, as a long Retry-After would stall every request to the host, see HostRateLimiter)
+def backoff_delay(attempt, response=None):
+    delay = retry_after(response)
+    if delay is None:
+        return min(backoff_max, backoff_base * 2 ** attempt) * random.uniform(0.5, 1)
+    return min(delay, backoff_max)
+
+
+def backoff(attempt, response=None):
+    count('retries')
+    time.sleep(backoff_delay(attempt, response))
+
+
+# Record every page fetched from now on into the zip archive at 'path'
+def record_to(path):
+    global archive, archive_mode
+    close_archive()
+    archive, archive_mode = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9), 'record'
+    atexit.register(close_archive)
+
+
+# Serve every page from the zip archive at 'path' (written by record_to) instead of the network
+def replay_from(path):
+    global archive, archive_mode
+    close_archive()
+    archive, archive_mode = zipfile.ZipFile(path), 'replay'
+    archive_urls.update(json.loads(archive.read('urls.json')))
+
+
+def close_archive():
+    global archive, archive_mode
+    with archive_lock:
+        if archive is not None:
+            if archive_mode == 'record':
+                archive.writestr('urls.json', json.dumps(archive_urls, indent=1))
+            archive.close()
+        archive, archive_mode = None, None
+        archive_urls.clear()
+
+
+def archive_name(url):
+    return 'pages/' + hashlib.sha256(url.encode()).hexdigest() + '.html'
+
+
+# Return the body of the page at 'url' as bytes
+# When replaying, the page comes from the archive, and when recording, the page is also saved into the archive
+def fetch(url, rate_limiter=None):
+    if archive_mode == 'replay':
+        if archive_name(url) not in archive_urls:
+            raise FetchError(url + ' is not in the replay archive')
+        count('replayed')
+        with archive_lock:
+            return archive.read(archive_name(url))
+    body = fetch_url(url, rate_limiter)
+    if archive_mode == 'record':
+        with archive_lock:
+            if archive_name(url) not in archive_urls:
+                archive.writestr(archive_name(url), body)
+                archive_urls[archive_name(url)] = url
+    return body
+
+
+# Download a page and return its body as bytes
+# Unchanged pages are served from the local cache, either without a request while the server says they are still
+# fresh, or after the server confirms with a 304 that they have not changed
+def fetch_url(url, rate_limiter=None):
+    meta, cached_body = load_cached(url)
+    if meta is not None and time.time() < meta['fetched_at'] + meta['max_age']:
+        count('cache_hits')
+        return cached_body
+
+    request_headers = dict(headers)
+    if meta is not None:
+        if meta['etag']:
+            request_headers['If-None-Match'] = meta['etag']
+        if meta['last_modified']:
+            request_headers['If-Modified-Since'] = meta['last_modified']
+
+    for attempt in range(max_retries + 1):
+        if rate_limiter:
+            rate_limiter.wait(url)
+        count('requests')
+        try:
+            response = http.request('GET', url, headers=request_headers)
+        except urllib3.exceptions.HTTPError as e:
+            if attempt == max_retries:
+                raise FetchError('Could not fetch ' + url + ': ' + str(e)) from e
+            backoff(attempt)
+            continue
+
+        # number of (compressed) bytes read from the connection
+        count('bytes_transferred', response.tell())
+        metrics.add_bytes(response.tell())
+
+        if rate_limiter and response.status in (200, 304):
+            rate_limiter.succeeded(url)
+        if response.status == 304 and cached_body is not None:
+            count('not_modified')
+            save_cached(url, response, None, meta)
+            return cached_body
+        if response.status == 200:
+            save_cached(url, response, response.data)
+            return response.data
+        if response.status not in retry_statuses or attempt == max_retries:
+            raise FetchError('Could not fetch ' + url + ': HTTP ' + str(response.status))
+        if rate_limiter and response.status in throttle_statuses:
+            # the wait applies to every request to the host, and happens in rate_limiter.wait() before the next attempt
+            count('retries')
+            rate_limiter.throttled(url, backoff_delay(attempt, response))
+        else:
+            backoff(attempt, response)
+
+
+def print_stats():
+    print('HTTP requests: %(requests)d, cache hits: %(cache_hits)d, not modified (304): %(not_modified)d, '
+          'retries: %(retries)d, bytes transferred: %(bytes_transferred)d, replayed: %(replayed)d' % stats)
@@ -0,0 +1,364 @@
+# The figures of the dashboard page, in groups that can be selected on the command line (see cli.py)
+# Each group is built by a function that takes the data of the page, a dict with
+#     'df_plot': the course table (one row per course)
+#     'df_plot_semester': the per-semester table (one row per course and semester, only for the 'semester' group)
+# When the individual reviews were scraped, both tables also have the error bars of each score (see pipeline.analyze).
+# and returns the parts of the page it adds: the figures and the html text around them, in order.
+# plotly.express (and pandas) are only imported when a figure is built, so importing this module is cheap.
+import re
+
+
+# Figure groups in the order they appear on the page, and the ones built when no figures are selected
+figure_groups = ['scatter', 'treemap', 'semester', 'hist', 'corr']
+default_figures = ['scatter', 'treemap', 'semester', 'corr']
+
+# Groups that need the per-semester aggregates, which means scraping the review page of every course
+semester_groups = ['semester']
+
+semester_title = "<h2>Plots by Semester</h2> <p>Slide the slider below each plot to see the data for each semester.</p>"
+
+
+# Arguments of px.scatter for the error bars of 'x' and 'y', if 'df' has them
+def error_bars(df, x, y):
+    if x + '_error' not in df or y + '_error' not in df:
+        return {}
+    return dict(error_x=x + '_error', error_x_minus=x + '_error_minus', error_y=y + '_error', error_y_minus=y + '_error_minus')
+
+
+def scatter_figures(data):
+    import plotly.express as px
+    df_plot = data['df_plot']
+
+    # OMSCS Course Rating and Difficulty Plot (size = Review Count, color = Workload)
+    fig_scatter1 = px.scatter(df_plot, x="difficulty", y="rating",
+                     hover_data=['name', 'reviewCount'], text='tag', size='reviewCount', color='workload',
+                     **error_bars(df_plot, "difficulty", "rating"))
+    fig_scatter1.update_traces(textposition='top center')
+    fig_scatter1.add_vline(x=df_plot["difficulty"].mean(), line_width=0.5, annotation_text = 'Mean Difficulty')
+    fig_scatter1.add_hline(y=df_plot["rating"].mean(), line_width=0.5, annotation_text = 'Mean Rating')
+    fig_scatter1.update_layout(
+        title="OMSCS Course Rating and Difficulty (size = Review Count, color = Workload)",
+        xaxis_title="Difficulty",
+        yaxis_title="Rating",
+        height=800,
+        font=dict(
+            size=10
+        )
+    )
+
+    # OMSCS Course Workload and Difficulty Plot (size = Review Count, color = Workload)
+    fig_scatter2 = px.scatter(df_plot, x="difficulty", y="workload",
+                     hover_data=['name', 'reviewCount'], text='tag', size='reviewCount', color='rating',
+                     **error_bars(df_plot, "difficulty", "workload"))
+    fig_scatter2.update_traces(textposition='top center')
+    fig_scatter2.add_vline(x=df_plot["difficulty"].mean(), line_width=0.5, annotation_text = 'Mean Difficulty')
+    fig_scatter2.add_hline(y=df_plot["workload"].mean(), line_width=0.5, annotation_text = 'Mean Workload')
+    fig_scatter2.update_layout(
+        title="OMSCS Course Workload and Difficulty (size = Review Count, color = Rating)",
+        xaxis_title="Difficulty",
+        yaxis_title="Workload",
+        height=800,
+        font=dict(
+            size=10
+        )
+    )
+    return [fig_scatter1, fig_scatter2]
+
+
+def treemap_figures(data):
+    import plotly.express as px
+    from .clean import treemap_label
+    df_plot = data['df_plot']
+
+    # Treemap Plot of Course Rating
+    # group data into department at the highest level, breaks it down into courses
+    # the 'values' parameter uses the value of the column to determine the relative size of each box in the chart
+    # the color of the chart follows the course rating
+    df_label = df_plot.assign(label=treemap_label(df_plot, 'rating'))
+    fig_treemap1 = px.treemap(df_label, path=[px.Constant("OMSCS Course Rating"), 'dept', 'label'], values='reviewCount',
+                      color='rating', hover_data=['name', 'difficulty'],
+                      color_continuous_scale=['#FF0000', "#000000", '#00FF00'])
+
+    fig_treemap1.update_traces(textposition="middle center")
+    fig_treemap1.update_layout(margin = dict(t=30, l=10, r=10, b=10), font_size=20)
+
+    # Treemap Plot of Course Difficulty
+    # group data into department at the highest level, breaks it down into courses
+    # the 'values' parameter uses the value of the column to determine the relative size of each box in the chart
+    # the color of the chart follows the course difficulty
+    df_label = df_plot.assign(label=treemap_label(df_plot, 'difficulty'))
+    fig_treemap2 = px.treemap(df_label, path=[px.Constant("OMSCS Course Difficulty"), 'dept', 'label'], values='reviewCount',
+                      color='difficulty', hover_data=['name', 'rating'],
+                      color_continuous_scale=['#FF0000', "#000000", '#00FF00'])
+
+    fig_treemap2.update_traces(textposition="middle center")
+    fig_treemap2.update_layout(margin = dict(t=30, l=10, r=10, b=10), font_size=20)
+    return [fig_treemap1, fig_treemap2]
+
+
+def semester_figures(data):
+    import plotly.express as px
+    df_plot, df_plot_semester = data['df_plot'], data['df_plot_semester']
+
+    # [With Semester Animation] OMSCS Course Rating and Difficulty Plot (size = Review Count, color = Workload)
+    x_col = "rating"
+    y_col = "difficulty"
+    size = "reviewCount"
+    color = "workload"
+
+    min_x = df_plot_semester[x_col].min() - 0.2
+    max_x = df_plot_semester[x_col].max() + 0.2
+    min_y = df_plot_semester[y_col].min() - 0.2
+    max_y = df_plot_semester[y_col].max() - 0.2
+
+    fig_semester1 = px.scatter(df_plot_semester, x=x_col, y=y_col, text='tag', animation_frame="semester", animation_group="name",
+               size=size, color=color,  size_max=20, hover_data=['name', 'reviewCount'], range_x=[min_x, max_x], range_y=[min_y, max_y],
+               **error_bars(df_plot_semester, x_col, y_col))
+    fig_semester1.add_vline(x=df_plot["difficulty"].mean(), line_width=0.5, annotation_text = 'Mean Difficulty')
+    fig_semester1.add_hline(y=df_plot["rating"].mean(), line_width=0.5, annotation_text = 'Mean Rating')
+
+    fig_semester1.update_traces(textposition='top center')
+    fig_semester1.update_layout(
+        title="OMSCS Course Rating and Difficulty (size = Review Count, color = Workload)",
+        xaxis_title="Difficulty",
+        yaxis_title="Rating",
+        height=800,
+        font=dict(
+            size=10
+        )
+    )
+
+    # [With Semester Animation] OMSCS Course Workload and Difficulty Plot (size = Review Count, color = Rating)
+    x_col = "difficulty"
+    y_col = "workload"
+    size = "reviewCount"
+    color = "rating"
+
+    min_x = df_plot_semester[x_col].min() - 0.2
+    max_x = df_plot_semester[x_col].max() + 0.2
+    min_y = df_plot_semester[y_col].min() - 0.2
+    max_y = df_plot_semester[y_col].max() - 0.2
+
+    fig_semester2 = px.scatter(df_plot_semester, x=x_col, y=y_col, text='tag', animation_frame="semester", animation_group="name",
+               size=size, color=color,  size_max=20, hover_data=['name', 'reviewCount'], range_x=[min_x, max_x], range_y=[min_y, max_y],
+               **error_bars(df_plot_semester, x_col, y_col))
+    fig_semester2.add_vline(x=df_plot["difficulty"].mean(), line_width=0.5, annotation_text = 'Mean Difficulty')
+    fig_semester2.add_hline(y=df_plot["workload"].mean(), line_width=0.5, annotation_text = 'Mean Workload')
+
+    fig_semester2.update_traces(textposition='top center')
+    fig_semester2.update_layout(
+        title="OMSCS Course Workload and Difficulty (size = Review Count, color = Rating)",
+        xaxis_title="Difficulty",
+        yaxis_title="Workload",
+        height=800,
+        font=dict(
+            size=10
+        )
+    )
+    return [semester_title, fig_semester1, fig_semester2]
+
+
+# Histogram Plots to Show Distributions of Workload, Rating and Difficulty
+# (not on the page by default, select them with --figures)
+def hist_figures(data):
+    import plotly.express as px
+    df_plot = data['df_plot']
+
+    fig_hist1 = px.histogram(df_plot, x='workload', nbins=30, title='Workload Distribution')
+    fig_hist1.update_layout(
+        width=800
+    )
+
+    fig_hist2 = px.histogram(df_plot, x='rating', nbins=30, title='Rating Distribution')
+    fig_hist2.update_layout(
+        width=800
+    )
+
+    fig_hist3 = px.histogram(df_plot, x='difficulty', nbins=30, title='Difficulty Distribution')
+    fig_hist3.update_layout(
+        width=800
+    )
+    return [fig_hist1, fig_hist2, fig_hist3]
+
+
+def corr_figures(data):
+    import plotly.express as px
+    df_plot = data['df_plot']
+
+    # Correlation Heatmap Between Workload, Rating and Difficulty
+    fig_corr = px.imshow(df_plot[['rating', 'difficulty', 'workload']].corr(), text_auto = True, title = 'Correlation')
+    return [fig_corr]
+
+
+figure_builders = {
+    'scatter': scatter_figures,
+    'treemap': treemap_figures,
+    'semester': semester_figures,
+    'hist': hist_figures,
+    'corr': corr_figures,
+}
+
+
+# Filtered views of the figures (see server.py)
+# The figures of every group are built once on the whole data, and a filtered view restricts their JSON (see
+# render.plain_json) to the selected courses and semesters instead of building them again with plotly.express, which
+# takes most of the time. The result is the figure plotly.express builds from the filtered data (up to the order of the
+# boxes of the treemaps):
+# - the points of the scatter plots and histograms are the ones of the selected courses, found by their 'ids', by the
+#   course name first in their 'customdata', or else by their position in the course table (one trace per figure)
+# - the animation frames and slider steps are the ones of the selected semesters that still have points
+# - the boxes of the treemaps are the ones of the selected courses, and the boxes above them sum up these courses only
+# - the heatmaps (correlation matrices) are computed again on the selected courses
+# - the mean lines, the axis ranges of the animations and the scale of the marker sizes follow the selected data
+
+# Attributes of the traces with one value per point
+point_attributes = [('x',), ('y',), ('text',), ('ids',), ('customdata',), ('hovertext',), ('marker', 'size'),
+                    ('marker', 'color'), ('error_x', 'array'), ('error_x', 'arrayminus'), ('error_y', 'array'),
+                    ('error_y', 'arrayminus')]
+
+
+# The course name of every point of a scatter or histogram trace ('names' are the names of the course table)
+def point_names(trace, names):
+    if 'ids' in trace:
+        return trace['ids']
+    if 'customdata' in trace:
+        return [row[0] for row in trace['customdata']]
+    return names
+
+
+# The trace with only the points whose 'keep' is true (the trace itself is not changed)
+def select_points(trace, keep):
+    trace = dict(trace)
+    for path in point_attributes:
+        parent = trace
+        for key in path[:-1]:
+            if not isinstance(parent.get(key), dict):
+                break
+            parent[key] = parent = dict(parent[key])
+        else:
+            values = parent.get(path[-1])
+            if isinstance(values, list) and len(values) == len(keep):
+                parent[path[-1]] = [value for value, kept in zip(values, keep) if kept]
+    return trace
+
+
+# The treemap trace with only the boxes of the courses in 'selected' (found by the course name first in their
+# 'customdata') and the boxes above them, summed up again like plotly.express does: values are added, colors are the
+# means weighted by the values, and the hover values are the ones all the courses below agree on, or '(?)'
+# (plotly.express turns the hover values into strings, the numbers in 'customdata' are the colors)
+def restrict_treemap(trace, selected):
+    ids, parents, customdata = trace['ids'], trace['parents'], trace['customdata']
+    position = {box: i for i, box in enumerate(ids)}
+    is_parent = set(parents)
+    is_leaf = [box not in is_parent for box in ids]
+    depth = [0] * len(ids)
+    for i in range(len(ids)):
+        parent = parents[i]
+        while parent:
+            depth[i] += 1
+            parent = parents[position[parent]]
+
+    values = [trace['values'][i] if is_leaf[i] and customdata[i][0] in selected else 0 for i in range(len(ids))]
+    color_sums = [value * color for value, color in zip(values, trace['marker']['colors'])]
+    hover = [[{row[j]} if values[i] else set() for j in range(len(row))] for i, row in enumerate(customdata)]
+    for i in sorted(range(len(ids)), key=lambda i: -depth[i]):
+        if parents[i] and values[i]:
+            parent = position[parents[i]]
+            values[parent] += values[i]
+            color_sums[parent] += color_sums[i]
+            for j, value_set in enumerate(hover[i]):
+                hover[parent][j] |= value_set
+
+    kept = [i for i in range(len(ids)) if values[i]]
+    colors = [color_sums[i] / values[i] for i in kept]
+    trace = dict(trace, ids=[ids[i] for i in kept], parents=[parents[i] for i in kept],
+                 labels=[trace['labels'][i] for i in kept], values=[values[i] for i in kept])
+    trace['marker'] = dict(trace['marker'], colors=[trace['marker']['colors'][i] if is_leaf[i] else color
+                                                    for i, color in zip(kept, colors)])
+    trace['customdata'] = [customdata[i] if is_leaf[i] else
+                           [color if not isinstance(value, str) else next(iter(hover[i][j])) if len(hover[i][j]) == 1 else '(?)'
+                            for j, value in enumerate(customdata[i])]
+                           for i, color in zip(kept, colors)]
+    return trace
+
+
+# The correlation heatmap trace computed again on the course table 'df_plot'
+def restrict_heatmap(trace, df_plot):
+    corr = df_plot[trace['x']].corr()
+    return dict(trace, z=corr.astype(object).where(corr.notna(), None).to_numpy().tolist())
+
+
+def restrict_trace(trace, selected, names, df_plot):
+    if trace.get('type') == 'treemap':
+        return restrict_treemap(trace, selected)
+    if trace.get('type') == 'heatmap':
+        return restrict_heatmap(trace, df_plot)
+    return select_points(trace, [name in selected for name in point_names(trace, names)])
+
+
+# The largest marker size of the traces (0 if they have none)
+def max_marker_size(traces):
+    return max([max(trace['marker']['size'], default=0) for trace in traces
+                if isinstance(trace.get('marker', {}).get('size'), list)], default=0)
+
+
+# The column plotted on 'axis' ('x' or 'y') by a plotly.express trace, from its hover template ('rating=%{x}')
+def axis_column(trace, axis):
+    match = re.search(r'([\w ]+)=%\{' + axis + r'\}', trace.get('hovertemplate', ''))
+    return match.group(1) if match else None
+
+
+# The figure (plain JSON built on 'data', see render.plain_json) with only the courses and semesters of 'filtered'
+# (see server.filter_data)
+def restrict_figure(figure, data, filtered):
+    df_plot = filtered['df_plot']
+    selected, names = set(df_plot['name']), data['df_plot']['name'].tolist()
+    figure = dict(figure)
+    layout = figure['layout'] = dict(figure['layout'])
+    traces = figure['data'] + [trace for frame in figure.get('frames', []) for trace in frame['data']]
+    figure['data'] = [restrict_trace(trace, selected, names, df_plot) for trace in figure['data']]
+
+    if figure.get('frames'):
+        semesters = set(filtered['df_plot_semester']['semester'])
+        frames = [dict(frame, data=[restrict_trace(trace, selected, names, df_plot) for trace in frame['data']])
+                  for frame in figure['frames'] if frame['name'] in semesters]
+        frames = [frame for frame in frames if any(trace.get('x') for trace in frame['data'])]
+        if frames:
+            # (the traces of the figure are the ones of its first frame, with the attributes only set on the figure)
+            figure['frames'] = frames
+            figure['data'] = [dict(trace, **{key: value for key, value in base.items() if key not in trace})
+                              for trace, base in zip(frames[0]['data'], figure['data'])]
+            frame_names = {frame['name'] for frame in frames}
+            layout['sliders'] = [dict(slider, steps=[step for step in slider['steps'] if step['args'][0][0] in frame_names])
+                                 for slider in layout.get('sliders', [])]
+
+        # (the axis ranges of the animations are kept at the same distance from the data)
+        for axis in ['x', 'y']:
+            column = axis_column(traces[0], axis)
+            if layout.get(axis + 'axis', {}).get('range') and column in filtered['df_plot_semester']:
+                before, after = data['df_plot_semester'][column], filtered['df_plot_semester'][column]
+                low, high = layout[axis + 'axis']['range']
+                layout[axis + 'axis'] = dict(layout[axis + 'axis'], range=[low + after.min() - before.min(),
+                                                                           high + after.max() - before.max()])
+
+    # the marker sizes are scaled to the largest marker left
+    restricted = figure['data'] + [trace for frame in figure.get('frames', []) for trace in frame['data']]
+    largest, largest_left = max_marker_size(traces), max_marker_size(restricted)
+    if largest and largest_left:
+        for trace in restricted:
+            if 'sizeref' in trace.get('marker', {}):
+                trace['marker'] = dict(trace['marker'], sizeref=trace['marker']['sizeref'] * largest_left / largest)
+
+    # the lines at the mean of a column (annotated 'Mean Difficulty' etc.) move to the mean of the selected courses
+    shapes, annotations = list(layout.get('shapes', [])), list(layout.get('annotations', []))
+    for i, annotation in enumerate(annotations):
+        match = re.fullmatch(r'Mean (\w+)', annotation.get('text', ''))
+        if match and match.group(1).lower() in df_plot and i < len(shapes):
+            mean = df_plot[match.group(1).lower()].mean()
+            if annotation.get('xref') == 'x':
+                annotations[i], shapes[i] = dict(annotation, x=mean), dict(shapes[i], x0=mean, x1=mean)
+            else:
+                annotations[i], shapes[i] = dict(annotation, y=mean), dict(shapes[i], y0=mean, y1=mean)
+    if shapes:
+        layout['shapes'], layout['annotations'] = shapes, annotations
+    return figure
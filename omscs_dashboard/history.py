@@ -0,0 +1,102 @@
+# Append-only store of every run's course table and per-semester aggregates, so ratings can be followed over time
+# and figures can be recomputed without scraping again.
+#
+# Each run is written as an uncompressed Arrow IPC file (so it can be memory-mapped and read without copying),
+# partitioned by day:
+#     history/courses/date=2023-05-01/20230501T103000Z.arrow
+#     history/semesters/date=2023-05-01/20230501T103000Z.arrow
+# Text columns are dictionary encoded and numbers stored as 32 bit values, and the snapshots of past days are compacted
+# into a single file per day, so 48 runs a day stay small and quick to scan.
+from datetime import datetime, timezone
+import glob
+import os
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .aggregate import metrics
+
+
+history_dir = 'history'
+
+text_type = pa.dictionary(pa.int32(), pa.string())
+
+schemas = {
+    'courses': pa.schema([('snapshot', pa.timestamp('s', tz='UTC')), ('name', text_type), ('tag', text_type),
+                          ('dept', text_type), ('code', text_type), ('reviewCount', pa.int32())]
+                         + [(metric, pa.float32()) for metric in metrics]),
+    'semesters': pa.schema([('snapshot', pa.timestamp('s', tz='UTC')), ('name', text_type), ('semester', text_type),
+                            ('reviewCount', pa.int32())]
+                           + [(metric, pa.float32()) for metric in metrics]
+                           + [(metric + '_var', pa.float32()) for metric in metrics]
+                           + [(metric + '_median', pa.float32()) for metric in metrics]),
+}
+
+compacted_name = 'all.arrow'
+
+
+def write_table(table, path):
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_table(path):
+    # the returned table points straight into the memory-mapped file
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+
+# Save the course table ('df_plot') and the per-semester aggregates (indexed by name and semester) of one run
+def append_snapshot(df_plot, semester_df, snapshot=None, root=history_dir):
+    snapshot = (snapshot or datetime.now(timezone.utc)).astimezone(timezone.utc).replace(microsecond=0)
+    frames = {'courses': df_plot, 'semesters': semester_df.reset_index()}
+    for table_name, df in frames.items():
+        schema = schemas[table_name]
+        df = df.assign(snapshot=snapshot)[schema.names]
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False).replace_schema_metadata(None)
+        partition = os.path.join(root, table_name, 'date=' + snapshot.strftime('%Y-%m-%d'))
+        os.makedirs(partition, exist_ok=True)
+        write_table(table, os.path.join(partition, snapshot.strftime('%Y%m%dT%H%M%SZ') + '.arrow'))
+        compact(root, table_name, before=snapshot.strftime('%Y-%m-%d'))
+
+
+# Merge the snapshot files of every day before 'before' (YYYY-MM-DD) into one file per day
+def compact(root=history_dir, table_name='courses', before=None):
+    for partition in sorted(glob.glob(os.path.join(root, table_name, 'date=*'))):
+        if before and partition.rsplit('=', 1)[1] >= before:
+            continue
+        paths = sorted(glob.glob(os.path.join(partition, '*.arrow')))
+        if len(paths) < 2:
+            continue
+        table = pa.concat_tables([read_table(path) for path in paths]).unify_dictionaries().combine_chunks()
+        write_table(table, os.path.join(partition, compacted_name + '.new'))
+        for path in paths:
+            os.remove(path)
+        os.replace(os.path.join(partition, compacted_name + '.new'), os.path.join(partition, compacted_name))
+
+
+def snapshot_files(root, table_name, start=None, end=None):
+    for partition in sorted(glob.glob(os.path.join(root, table_name, 'date=*'))):
+        date = partition.rsplit('=', 1)[1]
+        if (start and date < start.strftime('%Y-%m-%d')) or (end and date > end.strftime('%Y-%m-%d')):
+            continue
+        yield from sorted(glob.glob(os.path.join(partition, '*.arrow')))
+
+
+# Load the history of one course between the 'start' and 'end' datetimes (both optional) as a DataFrame,
+# one row per snapshot from the 'courses' table, or one row per snapshot and semester from the 'semesters' table
+def load_course_history(name, table_name='courses', start=None, end=None, root=history_dir):
+    tables = []
+    for path in snapshot_files(root, table_name, start, end):
+        table = read_table(path)
+        mask = pc.equal(table['name'], name)
+        if start:
+            mask = pc.and_(mask, pc.greater_equal(table['snapshot'], pa.scalar(start, pa.timestamp('s', tz='UTC'))))
+        if end:
+            mask = pc.and_(mask, pc.less_equal(table['snapshot'], pa.scalar(end, pa.timestamp('s', tz='UTC'))))
+        tables.append(table.filter(mask))
+    if not tables:
+        return schemas[table_name].empty_table().to_pandas()
+    return pa.concat_tables(tables).unify_dictionaries().to_pandas().sort_values('snapshot', kind='stable').reset_index(drop=True)
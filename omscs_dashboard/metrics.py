@@ -0,0 +1,157 @@
+# Metrics for each stage of the update pipeline (fetch, parse, aggregate, store, analytics, render, html)
+# For every stage: wall clock time, CPU time (including finished child processes), peak memory (RSS) of the process at the end of the stage,
+# bytes fetched from the network and number of rows processed, plus per-course numbers for the scrape.
+#
+# A script calls reset() when a run starts and marks the start of each stage with start_stage(). Work that runs in the
+# middle of one stage but belongs to another (such as parsing review pages while the rest are still being downloaded) is
+# wrapped in 'with nested(stage):', and its time is not counted again for the stage that was running.
+# The metrics can be printed, written as JSON, or written as a Prometheus textfile (for node_exporter's textfile collector).
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+
+stages = {}
+courses = []
+
+current_stage = None
+stage_started = None
+nested_wall = 0
+nested_cpu = 0
+lock = threading.Lock()
+
+
+# Forget the metrics of the previous run (for processes that run the update more than once, like the dashboard server)
+def reset():
+    global current_stage, stage_started, nested_wall, nested_cpu
+    with lock:
+        stages.clear()
+        courses.clear()
+        current_stage, stage_started, nested_wall, nested_cpu = None, None, 0, 0
+
+
+def stage_metrics(stage):
+    if stage not in stages:
+        stages[stage] = {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss_bytes': 0, 'bytes_fetched': 0, 'rows': 0}
+    return stages[stage]
+
+
+def peak_rss():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+# CPU time of this process, and of the child processes that have finished (such as the workers building the figures)
+def cpu_time():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def start_stage(stage):
+    global current_stage, stage_started, nested_wall, nested_cpu
+    end_stage()
+    stage_metrics(stage)
+    current_stage, nested_wall, nested_cpu = stage, 0, 0
+    stage_started = (time.perf_counter(), cpu_time())
+
+
+def end_stage():
+    global current_stage
+    if current_stage is None:
+        return
+    wall, cpu = time.perf_counter() - stage_started[0], cpu_time() - stage_started[1]
+    metrics = stage_metrics(current_stage)
+    metrics['wall_seconds'] += wall - nested_wall
+    metrics['cpu_seconds'] += cpu - nested_cpu
+    metrics['peak_rss_bytes'] = max(metrics['peak_rss_bytes'], peak_rss())
+    current_stage = None
+
+
+# Count the time spent inside the block for 'stage' instead of the stage that is running
+# (only the CPU time of the calling thread is moved, other threads keep counting for the running stage)
+@contextmanager
+def nested(stage):
+    global nested_wall, nested_cpu
+    started = (time.perf_counter(), time.thread_time())
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - started[0], time.thread_time() - started[1]
+        metrics = stage_metrics(stage)
+        metrics['wall_seconds'] += wall
+        metrics['cpu_seconds'] += cpu
+        metrics['peak_rss_bytes'] = max(metrics['peak_rss_bytes'], peak_rss())
+        if current_stage is not None:
+            nested_wall += wall
+            nested_cpu += cpu
+
+
+# Bytes read from the network, counted for the running stage (called by fetch.py from any thread)
+def add_bytes(amount):
+    with lock:
+        stage_metrics(current_stage or 'other')['bytes_fetched'] += amount
+
+
+def add_rows(amount, stage=None):
+    stage_metrics(stage or current_stage or 'other')['rows'] += int(amount)
+
+
+# Metrics of one course of the scrape stage (name, seconds waited for the page, parse and aggregate seconds, ...)
+def add_course(**course_metrics):
+    courses.append(course_metrics)
+
+
+def summary():
+    end_stage()
+    total = {key: sum(metrics[key] for metrics in stages.values()) for key in ['wall_seconds', 'cpu_seconds', 'bytes_fetched']}
+    total['peak_rss_bytes'] = peak_rss()
+    return {'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'stages': stages, 'total': total, 'courses': courses}
+
+
+def print_timings():
+    end_stage()
+    print('%-10s %9s %9s %10s %12s %9s' % ('stage', 'wall (s)', 'cpu (s)', 'rss (MB)', 'fetched (B)', 'rows'))
+    for stage, metrics in stages.items():
+        print('%-10s %9.3f %9.3f %10.1f %12d %9d' % (stage, metrics['wall_seconds'], metrics['cpu_seconds'],
+                                                    metrics['peak_rss_bytes'] / 1e6, metrics['bytes_fetched'], metrics['rows']))
+    total = summary()['total']
+    print('%-10s %9.3f %9.3f %10.1f %12d' % ('total', total['wall_seconds'], total['cpu_seconds'],
+                                            total['peak_rss_bytes'] / 1e6, total['bytes_fetched']))
+
+
+def write_atomic(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json(path):
+    write_atomic(path, json.dumps(summary(), indent=1))
+
+
+def write_prometheus(path, prefix='omscs_update'):
+    end_stage()
+    lines = []
+    for key, help_text in [('wall_seconds', 'Wall clock time spent in each stage'),
+                           ('cpu_seconds', 'CPU time spent in each stage'),
+                           ('peak_rss_bytes', 'Peak resident memory of the process at the end of each stage'),
+                           ('bytes_fetched', 'Bytes read from the network in each stage'),
+                           ('rows', 'Rows processed in each stage')]:
+        name = prefix + '_stage_' + key
+        lines += ['# HELP ' + name + ' ' + help_text + ' of the last run.', '# TYPE ' + name + ' gauge']
+        lines += ['%s{stage="%s"} %s' % (name, stage, metrics[key]) for stage, metrics in stages.items()]
+    lines += ['# HELP ' + prefix + '_courses_scraped Number of course review pages scraped in the last run.',
+              '# TYPE ' + prefix + '_courses_scraped gauge',
+              prefix + '_courses_scraped ' + str(len(courses)),
+              '# HELP ' + prefix + '_last_run_timestamp_seconds Time the last run finished.',
+              '# TYPE ' + prefix + '_last_run_timestamp_seconds gauge',
+              prefix + '_last_run_timestamp_seconds ' + str(int(time.time()))]
+    write_atomic(path, '\n'.join(lines) + '\n')
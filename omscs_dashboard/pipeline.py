@@ -0,0 +1,408 @@
+# The stages of the update: fetch the course list from OMS Central, clean it, scrape the per-semester aggregates of
+# every course, keep them in the history store, estimate the confidence intervals of the scores, build the figures and
+# write the page.
+# build() only runs the stages the selected figures need, and each stage imports the libraries it uses when it runs,
+# so a page without the semester plots neither scrapes the review pages nor imports pyarrow for the history store.
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import json
+import os
+import pickle
+
+from .figures import figure_groups, default_figures, semester_groups, figure_builders
+from .metrics import start_stage, add_rows
+
+
+landing_url = 'https://www.omscentral.com/'
+
+# Filter data with minimum review count of 5
+min_review_count = 5
+
+# Fetch up to 8 course review pages at the same time, starting at 4 requests per second to OMS Central
+# (the rate then adapts to how OMS Central answers, see scrape.py)
+max_workers = 8
+requests_per_second = 4
+
+default_output = 'omscs_courses_rating_difficulty.html'
+
+# Folder of the review-level export (see export.py)
+default_export_dir = 'export'
+
+# Exit status when the data is the same as in the last run, and the page was not built again
+unchanged_exit_status = 3
+
+
+# Scrape the course list of OMS Central into a DataFrame (one row per course, as OMS Central has it)
+def load_courses(url=landing_url):
+    from bs4 import BeautifulSoup
+    import pandas as pd
+    from .fetch import fetch
+
+    start_stage('fetch')
+    # (fetch retries with exponential backoff if the request fails or is blocked)
+    response = fetch(url)
+
+    # Read the contents of the file into 'html'
+    start_stage('parse')
+    html = BeautifulSoup(response, 'html.parser')
+
+    # Parse the Course Reviews Data into a Python List
+    # Find the data in between the final <script> tags in the website
+    raw = html.find_all("script")[-1]
+
+    # Load the relevant part of the data into a Python List
+    parsed = json.loads(raw.text)['props']['pageProps']['courses']
+
+    raw_df = pd.DataFrame(parsed)
+    add_rows(len(raw_df))
+    return raw_df
+
+
+# The course table of the page (see clean.py), with the URL of the reviews of each course
+def course_table(raw_df, min_review_count=min_review_count):
+    from slugify import slugify
+    from .clean import clean_courses
+
+    start_stage('aggregate')
+    # Extract the course code, department and tag, filter out courses with too few reviews and fix outliers
+    df_plot = clean_courses(raw_df, min_review_count)
+    add_rows(len(raw_df))
+
+    df_plot['reviewsURL'] = "https://www.omscentral.com/courses/" + df_plot['name'].apply(slugify) + "/reviews"
+    df_plot['semester'] = 'All'
+    return df_plot
+
+
+# The per-semester aggregates of every course, indexed by name and semester, in the order of the courses of 'df_plot'
+# Courses whose review count is unchanged since the last run reuse the aggregates saved in the state store 'state',
+# the review pages of the others are scraped concurrently (see scrape.py for the worker pool and rate limit settings)
+# Every scraped course is saved in the state store as soon as it is done, so that if the run is interrupted, the next
+# one only scrapes the courses that were not done yet. Courses whose review page cannot be fetched (even after the
+# retries of fetch.py) keep the aggregates of their last scrape for this run, and are scraped again by the next one.
+# If a 'reviews' dict is given, the review tuples of every course (scraped or from the state store) are put in it by name
+def semester_aggregates(df_plot, state, reviews=None, max_workers=max_workers, requests_per_second=requests_per_second):
+    import pandas as pd
+    from .scrape import scrape_courses
+    from .state_store import load_cached, save_courses, load_reviews, load_saved
+
+    review_counts = dict(zip(df_plot['name'], df_plot['reviewCount']))
+    cached_reviews_df, changed_names = load_cached(state, review_counts)
+    df_changed = df_plot[df_plot['name'].isin(changed_names)]
+
+    # save the rows the scrape already aggregated for the course
+    def checkpoint(name, course_reviews, course_reviews_df):
+        save_courses(state, course_reviews_df, {name: review_counts[name]}, {name: course_reviews})
+
+    start_stage('fetch')
+    scraped_reviews = {}
+    scraped_reviews_df, failed_names = scrape_courses(df_changed['name'], df_changed['reviewsURL'], max_workers,
+                                                      requests_per_second, scraped_reviews, checkpoint)
+    start_stage('store')
+    stale_reviews_df = load_saved(state, failed_names)
+    print(str(len(changed_names) - len(failed_names)) + ' courses scraped, ' + str(len(df_plot) - len(changed_names)) +
+          ' reused from the state store, ' + str(len(failed_names)) + ' failed')
+    if reviews is not None:
+        reviews.update(load_reviews(state, [name for name in review_counts if name not in scraped_reviews]))
+        reviews.update(scraped_reviews)
+
+    # keep the courses in the same order as df_plot
+    return pd.concat([cached_reviews_df, scraped_reviews_df, stale_reviews_df]).reindex(df_plot['name'], level='name')
+
+
+# Write the review-level table, the course table and their indexes to the 'root' folder (see export.py)
+def export_reviews(df_plot, reviews, root=default_export_dir):
+    from .export import write_export
+
+    start_stage('export')
+    reviews_df = write_export(df_plot, reviews, root)
+    add_rows(len(reviews_df))
+
+
+# Bayesian averages and bootstrap confidence intervals of the scores from the individual 'reviews' (see analytics.py),
+# per course and per course and semester
+def analyze(df_plot, reviews):
+    from .aggregate import review_table
+    from .analytics import course_estimates, semester_estimates
+
+    start_stage('analytics')
+    reviews_df = review_table(reviews, df_plot['name'])
+    course_df = course_estimates(reviews_df)
+    semester_df = semester_estimates(reviews_df, course_df)
+    add_rows(len(reviews_df))
+    return course_df, semester_df
+
+
+# The error bars of the plots: the distance from the Bayesian average of each score (see analytics.py) to the bounds of
+# its confidence interval, in the '<score>_error' and '<score>_error_minus' columns
+def add_error_columns(df, estimates_df):
+    from .aggregate import metrics
+
+    for metric in metrics:
+        df[metric + '_error'] = estimates_df[metric + '_shrunk_high'] - estimates_df[metric + '_shrunk']
+        df[metric + '_error_minus'] = estimates_df[metric + '_shrunk'] - estimates_df[metric + '_shrunk_low']
+    return df
+
+
+# The course table with the Bayesian averages of the reviews of every course (from the estimates of analyze(),
+# 'course_df') in place of the scores of OMS Central, with their error bars
+# Courses without any scraped review keep the scores of OMS Central, without error bars. The outlier rule of clean.py
+# is applied again to the new scores, and the scores it caps have no error bars either, as their interval is not
+# around the capped value.
+def course_scores(df_plot, course_df):
+    import numpy as np
+    from .aggregate import metrics
+    from .clean import cap_outliers, outlier_columns
+
+    estimates_df = course_df.reindex(df_plot['name'])
+    estimates_df.index = df_plot.index
+    df = df_plot.copy()
+    for metric in metrics:
+        df[metric] = estimates_df[metric + '_shrunk'].fillna(df[metric])
+    df = add_error_columns(df, estimates_df)
+    uncapped = df[outlier_columns].copy()
+    df = cap_outliers(df)
+    for column in outlier_columns:
+        df.loc[df[column] != uncapped[column], [column + '_error', column + '_error_minus']] = np.nan
+    return df
+
+
+# Keep this run's course table and per-semester aggregates in the history store (see history.py)
+def keep_history(df_plot, course_reviews_df_all):
+    from .history import append_snapshot
+
+    start_stage('store')
+    append_snapshot(df_plot, course_reviews_df_all)
+    add_rows(len(df_plot) + len(course_reviews_df_all))
+
+
+# Bring the rollups of the scores per course, department and semester in the state store up to date (see rollups.py)
+def course_rollups(df_plot, reviews, state):
+    from .rollups import update_rollups
+
+    start_stage('aggregate')
+    cube = update_rollups(state, reviews, dict(zip(df_plot['name'], df_plot['dept'])))
+    add_rows(len(cube))
+    return cube
+
+
+# The table of the animated plots: one row per course and semester, sorted by semester, from the course rows of the
+# rollups ('cube'), with the integer 'ordinal' of each semester
+# With the estimates of analyze() ('semester_df'), the scores of each semester are the Bayesian averages, so that
+# semesters with only one or two reviews do not jump around the plots, and they come with their error bars
+def semester_table(df_plot, cube, semester_df=None):
+    from .aggregate import metrics
+    from .rollups import rollup_table
+
+    start_stage('aggregate')
+    df_all = rollup_table(cube, 'course').drop(columns='dept').rename(columns={'key': 'name', 'reviews': 'reviewCount'})
+    df_all = df_all[df_all['ordinal'] >= 0].set_index(['name', 'semester'])
+    if semester_df is not None:
+        estimates_df = semester_df.reindex(df_all.index)
+        for metric in metrics:
+            df_all[metric] = estimates_df[metric + '_shrunk'].fillna(df_all[metric])
+        df_all = add_error_columns(df_all, estimates_df)
+    # (the courses in the order of df_plot within each semester)
+    df_plot_semester = df_plot[['name', 'tag', 'dept', 'code', 'description']].merge(df_all.reset_index(), on='name')
+    df_plot_semester = df_plot_semester.sort_values('ordinal', kind='stable').reset_index(drop=True)
+    add_rows(len(df_plot_semester))
+    return df_plot_semester
+
+
+# The data of the page in the worker processes of build_figures(), unpickled once when each worker starts
+worker_data = None
+
+
+def load_worker_data(data_pickle):
+    global worker_data
+    worker_data = pickle.loads(data_pickle)
+
+
+# Build the figures of one group (see figures.py) and serialize them for the page (see render.py)
+def figure_parts(group, data=None):
+    from .render import figure_json
+
+    parts = figure_builders[group](worker_data if data is None else data)
+    return [part if isinstance(part, str) else figure_json(part) for part in parts]
+
+
+# Build and serialize the figures of the selected groups, returns the figures and html text of the page in order
+# The groups are built in 'jobs' worker processes (by default one per group, up to the number of CPUs), which get the
+# data once, pickled, when they start. The results come back in the order of the groups, so the page is the same as
+# when they are built one after the other in this process (jobs=1).
+def build_figures(figures, data, jobs=None):
+    start_stage('render')
+    groups = [group for group in figure_groups if group in figures]
+    jobs = min(len(groups), jobs or os.cpu_count() or 1)
+    if jobs > 1:
+        # (imported here so that workers started by forking this process do not each import it again)
+        import plotly.express  # noqa: F401
+        data_pickle = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        with ProcessPoolExecutor(jobs, initializer=load_worker_data, initargs=(data_pickle,)) as pool:
+            results = list(pool.map(figure_parts, groups))
+    else:
+        results = [figure_parts(group, data) for group in groups]
+
+    parts = []
+    for group, group_parts in zip(groups, results):
+        parts += group_parts
+        add_rows(len(data['df_plot_semester'] if group in semester_groups else data['df_plot']))
+    return parts
+
+
+def page_header():
+    # Get current date, time and timezone to print to the html page
+    now = datetime.now()
+    dt_string = now.strftime("%m/%d/%Y %I:%M:%S %p")
+    timezone_string = datetime.now().astimezone().tzname()
+
+    title = "<h1>Georgia Tech OMSCS</h1><h2>Summary of Course Difficulty and Rating</h2>"
+    updated = "<h3>Last updated: <span id='timestring'></span></h3>"
+    # GitHub Actions server timezone may not be at the same timezone of person opening the page on browser
+    # hence Javascript code is written below to convert to client timezone before printing it on
+    current_time = "<script>var date = new Date('" + dt_string + " " + timezone_string + "'); document.getElementById('timestring').innerHTML += date.toString()</script>"
+    description = "The data is pulled from <a href='https://www.omscentral.com/'>OMSCentral</a> daily via a GitHub Actions script to update the summary information in this page.<br><br>"
+    credits = "Credits to <a href='https://www.omscentral.com/'>OMSCentral</a> for the information, review and rating of the courses. I do not own any of this data."
+    subtitle = "<h3>Explanation and Source Code</h3>"
+    code = """<a href="https://medium.datadriveninvestor.com/use-python-to-analyze-georgia-tech-omscs-course-ratings-and-reviews-675a912aceed">Explanatory Article</a> | <a href="https://github.com/damianboh/gatech_omscs_live_rating_reviews_plot">Source Code</a>"""
+    author = """ | Created by Damian Boh, check out my <a href="https://damianboh.github.io/">GitHub Page</a> <br><br> <a href="https://www.buymeacoffee.com/bohmian" target="_blank"><img src="https://cdn.buymeacoffee.com/buttons/v2/default-yellow.png" alt="Buy Me A Coffee" style="height: 45px !important;width: 152px !important;" ></a>"""
+    return title + updated + current_time + description + credits + subtitle + code + author
+
+
+# for analytics
+analytics = """<!-- Google tag (gtag.js) -->
+    <script async src="https://www.googletagmanager.com/gtag/js?id=G-Y515CK5KCN"></script>
+    <script>
+      window.dataLayer = window.dataLayer || [];
+      function gtag(){dataLayer.push(arguments);}
+      gtag('js', new Date());
+
+      gtag('config', 'G-Y515CK5KCN');
+    </script>
+    """
+
+
+# Generate HTML File with Updated Time and the figures serialized by build_figures() (see render.py)
+def write_page(parts, output=default_output, precompress=(), lazy_frames=False):
+    from .render import PageRenderer
+
+    start_stage('html')
+    page = PageRenderer(lazy_frames=lazy_frames)
+    page.add_html(page_header())
+    for part in parts:
+        if isinstance(part, str):
+            page.add_html(part)
+        else:
+            page.add_figure_json(part)
+    page.add_html(analytics)
+    page.write(output, precompress)
+
+
+# The files write_page() writes: the page, its precompressed copies and the folder of the animation frames (see
+# render.PageRenderer.write)
+def page_files(output=default_output, precompress=(), lazy_frames=False):
+    files = [output] + [output + {'gzip': '.gz', 'br': '.br'}[encoding] for encoding in precompress]
+    if lazy_frames:
+        files.append(os.path.splitext(output)[0] + '_frames')
+    return files
+
+
+# Summary of the network usage and the metrics of each stage of this run
+def report(metrics_json=None, metrics_prometheus=None):
+    from .fetch import close_archive, print_stats
+    from .metrics import print_timings, write_json, write_prometheus
+
+    close_archive()
+    print_stats()
+    print_timings()
+    if metrics_json:
+        write_json(metrics_json)
+    if metrics_prometheus:
+        write_prometheus(metrics_prometheus)
+
+
+# Scrape the course table and, if the figure groups in 'figures' or the export need them, the per-semester aggregates,
+# reviews and rollups of every course (None otherwise), keeping them in the history store and the export folder
+def load_data(figures, state, replay=False, export=None):
+    df_plot = course_table(load_courses())
+    course_reviews_df_all = reviews = cube = None
+    if export or any(group in semester_groups for group in figures):
+        reviews = {}
+        course_reviews_df_all = semester_aggregates(df_plot, state, reviews)
+        cube = course_rollups(df_plot, reviews, state)
+        # (replayed runs are not real snapshots, so they are left out of the history)
+        if not replay:
+            keep_history(df_plot, course_reviews_df_all)
+        if export:
+            export_reviews(df_plot, reviews, export)
+    return df_plot, course_reviews_df_all, reviews, cube
+
+
+# The data the figures are built from (see figures.py), from the tables of load_data()
+# (with the rollups, also the department and all-course rows of the rollups in 'rollups', see rollups.rollup_table)
+def page_data(df_plot, reviews, cube):
+    from .rollups import rollup_table
+
+    data = {'df_plot': df_plot}
+    if reviews is not None:
+        course_df, semester_df = analyze(df_plot, reviews)
+        data['df_plot'] = course_scores(df_plot, course_df)
+        data['df_plot_semester'] = semester_table(data['df_plot'], cube, semester_df)
+        data['rollups'] = {level: rollup_table(cube, level) for level in ['dept', 'all']}
+    return data
+
+
+# Run the update and write the page with the figure groups in 'figures', returns the exit status
+# 'record' saves every page fetched from OMS Central into a zip archive, and 'replay' builds the page from such an archive
+# without any network access (both scrape every course, instead of reusing the aggregates in the state store)
+# 'export' is the folder to write the review-level export to (None for no export)
+# The hash of the data and of the options the page was built with is saved in the state store, so that the next run
+# with the same data and options can skip building it again. With 'defer_hash', it is only saved as pending, and
+# commit_hash() saves it once the page is published, so that a page that failed to be published is built again.
+def build(figures=default_figures, output=default_output, record=None, replay=None, precompress=(), lazy_frames=False,
+          force=False, jobs=None, export=None, metrics_json=None, metrics_prometheus=None, defer_hash=False):
+    from .fetch import record_to, replay_from, reset_stats
+    from .metrics import reset
+    from .state_store import open_state, state_path, content_hash, last_content_hash, save_content_hash
+
+    # (the metrics and network statistics are only of this run, even when build() is called again in the same process)
+    reset()
+    reset_stats()
+    if record:
+        record_to(record)
+    if replay:
+        replay_from(replay)
+
+    # (when recording or replaying, a temporary empty state is used so that every course is scraped)
+    state = open_state(':memory:' if record or replay else state_path)
+    df_plot, course_reviews_df_all, reviews, cube = load_data(figures, state, replay, export)
+
+    # Nothing else to do if the data and the options are the same as for the last page built, and its files are still
+    # there (the page would only differ by its 'last updated' time)
+    options = {'figures': list(figures), 'output': os.path.abspath(output), 'precompress': sorted(precompress),
+               'lazy_frames': lazy_frames, 'export': export and os.path.abspath(export)}
+    data_hash = content_hash(df_plot, course_reviews_df_all, options=json.dumps(options, sort_keys=True))
+    written = all(os.path.exists(path) for path in page_files(output, precompress, lazy_frames))
+    if data_hash == last_content_hash(state) and written and not force:
+        print('The data has not changed since the last run, the page was not built')
+        report(metrics_json, metrics_prometheus)
+        return unchanged_exit_status
+
+    data = page_data(df_plot, reviews, cube)
+    parts = build_figures(figures, data, jobs)
+    write_page(parts, output, precompress, lazy_frames)
+
+    save_content_hash(state, data_hash, pending=defer_hash)
+    report(metrics_json, metrics_prometheus)
+    return 0
+
+
+# Save the pending hash of the last build(..., defer_hash=True) as the hash of the last page built, once the page is
+# published. Returns the exit status (1 if there was no pending hash).
+def commit_hash():
+    from .state_store import open_state, state_path, commit_content_hash
+
+    state = open_state(state_path)
+    if not commit_content_hash(state):
+        print('There is no pending hash to commit')
+        return 1
+    return 0
@@ -0,0 +1,308 @@
+# Compact HTML renderer for the dashboard figures
+# fig.to_html() gives every figure its own copy of the plotly.js script tag, of the plotly template and of every data
+# array (and the animated figures repeat the data of every course once per frame). Instead, this renderer
+# - loads plotly.js once for the whole page
+# - writes each figure as compact JSON, with floats rounded to a few decimals
+# - moves every array, object or long string that appears more than once (in any of the figures) into a shared table,
+#   which a small script expands again before each figure is plotted
+# - can also write gzip / brotli precompressed copies of the page for web servers that serve them directly
+# - can write the animation frames to separate files next to the page, which are only downloaded when the slider or the
+#   play button needs them, so the page does not grow with every new semester
+import base64
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Number of decimals kept for floats in the figure data
+float_decimals = 4
+
+# Repeated values shorter than this (in JSON characters) are cheaper to repeat than to reference
+min_shared_length = 32
+
+
+# Expands the {"$s": i} references to the shared table, copying the shared value each time so no two figures share objects
+expand_script = '''<script>
+function omscsExpand(value) {
+    if (Array.isArray(value)) return value.map(omscsExpand);
+    if (value !== null && typeof value === 'object') {
+        if ('$s' in value) return omscsExpand(omscsShared[value['$s']]);
+        var expanded = {};
+        for (var key in value) expanded[key] = omscsExpand(value[key]);
+        return expanded;
+    }
+    return value;
+}
+</script>'''
+
+# Loads the frames of an animated figure on demand: the page only has placeholder frames (the frame names), which are
+# replaced by the frame data fetched from 'urls' (frame name -> url) the first time the slider moves to them, or all at
+# once when the play button is clicked. Fetched frames are cached, and the frame files never change (their name is a
+# hash of their content) so the browser can cache them as well.
+lazy_frames_script = '''<script>
+var omscsFrameCache = {};
+function omscsLoadFrame(url) {
+    if (!(url in omscsFrameCache)) {
+        omscsFrameCache[url] = fetch(url).then(function(response) {
+            if (!response.ok) throw new Error('could not load ' + url + ': ' + response.status);
+            return response.json();
+        });
+    }
+    return omscsFrameCache[url];
+}
+function omscsLazyFrames(divId, urls) {
+    var div = document.getElementById(divId);
+    var loaded = {};
+    var latest = 0;
+    function load(names) {
+        var missing = names.filter(function(name) { return !loaded[name]; });
+        return Promise.all(missing.map(function(name) { return omscsLoadFrame(urls[name]); })).then(function(frames) {
+            frames.forEach(function(frame) { loaded[frame.name] = true; });
+            if (frames.length) return Plotly.addFrames(div, frames);
+        });
+    }
+    div.on('plotly_sliderchange', function(event) {
+        var names = event.step.args[0];
+        var request = ++latest;
+        if (names.every(function(name) { return loaded[name]; })) return;
+        load(names).then(function() {
+            if (request === latest) Plotly.animate(div, names, event.step.args[1]);
+        });
+    });
+    div.on('plotly_buttonclicked', function(event) {
+        if (event.button.method !== 'skip' || event.button.args[0] !== null) return;
+        var request = ++latest;
+        load(Object.keys(urls)).then(function() {
+            if (request === latest) Plotly.animate(div, null, event.button.args[1]);
+        });
+    });
+}
+</script>'''
+
+
+def dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+# The numpy array of an array encoded as base64 ("bdata") by plotly
+def bdata_array(value):
+    array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+    if 'shape' in value:
+        shape = value['shape']
+        array = array.reshape([int(n) for n in shape.split(',')] if isinstance(shape, str) else shape)
+    return array
+
+
+# Round floats and turn float arrays encoded as base64 ("bdata") into plain lists of rounded numbers,
+# which are shorter than their base64 form once rounded
+def compact(value, decimals):
+    if isinstance(value, float):
+        rounded = round(value, decimals)
+        return int(rounded) if rounded.is_integer() and abs(rounded) < 2 ** 53 else rounded
+    if isinstance(value, list):
+        return [compact(item, decimals) for item in value]
+    if isinstance(value, dict):
+        if 'bdata' in value and 'dtype' in value and value['dtype'].startswith('f'):
+            return compact(bdata_array(value).tolist(), decimals)
+        return {key: compact(item, decimals) for key, item in value.items()}
+    return value
+
+
+# Turn every array encoded as base64 in 'value' into a plain list of numbers
+def decode_arrays(value):
+    if isinstance(value, list):
+        return [decode_arrays(item) for item in value]
+    if isinstance(value, dict):
+        if 'bdata' in value and 'dtype' in value:
+            return bdata_array(value).tolist()
+        return {key: decode_arrays(item) for key, item in value.items()}
+    return value
+
+
+# The figure as a dict of plain JSON values, compacted as above
+def figure_json(fig, decimals=float_decimals):
+    return compact(json.loads(pio.to_json(fig, validate=False)), decimals)
+
+
+# The figure as a dict of plain JSON values with every array as a plain list, for views that change the figure (see
+# figures.restrict_figure)
+def plain_json(fig):
+    return decode_arrays(json.loads(pio.to_json(fig, validate=False)))
+
+
+# Count how often every array, object and long string appears in 'value' and return its JSON text
+def count_values(value, counts):
+    if isinstance(value, list):
+        text = '[' + ','.join(count_values(item, counts) for item in value) + ']'
+    elif isinstance(value, dict):
+        text = '{' + ','.join(dumps(key) + ':' + count_values(item, counts) for key, item in value.items()) + '}'
+    else:
+        text = dumps(value)
+        if not isinstance(value, str):
+            return text
+    if len(text) >= min_shared_length:
+        counts[text] = counts.get(text, 0) + 1
+    return text
+
+
+class SharedTable:
+    def __init__(self, counts):
+        self.counts = counts
+        self.index = {}
+        self.values = []
+
+    # Replace the repeated parts of 'value' (the largest ones first) with references to the shared table
+    def share(self, value):
+        if isinstance(value, (list, dict, str)):
+            text = dumps(value)
+            if self.counts.get(text, 0) > 1:
+                if text not in self.index:
+                    self.index[text] = len(self.values)
+                    self.values.append(None)
+                    self.values[self.index[text]] = self.share_children(value)
+                return {'$s': self.index[text]}
+        return self.share_children(value)
+
+    def share_children(self, value):
+        if isinstance(value, list):
+            return [self.share(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.share(item) for key, item in value.items()}
+        return value
+
+
+class PageRenderer:
+    # With lazy_frames, the animation frames are written to a '<page name>_frames' folder next to the page instead of
+    # being included in it (the page then has to be served over http for the browser to fetch them)
+    def __init__(self, float_decimals=float_decimals, lazy_frames=False):
+        self.float_decimals = float_decimals
+        self.lazy_frames = lazy_frames
+        self.parts = []  # html strings, and dicts for the figures
+
+    def add_html(self, html):
+        self.parts.append(html)
+
+    def add_figure(self, fig, auto_play=False):
+        self.add_figure_json(figure_json(fig, self.float_decimals), auto_play)
+
+    # Add a figure already serialized by figure_json() (e.g. in another process)
+    def add_figure_json(self, figure, auto_play=False):
+        self.parts.append({'figure': figure, 'auto_play': auto_play})
+
+    # Returns the html of the page, and the frame files (file name -> JSON text) when the frames are loaded lazily,
+    # in which case 'frames_url' is the url of the folder of the frame files, relative to the page
+    def render(self, frames_url=None):
+        figures = [part['figure'] for part in self.parts if isinstance(part, dict)]
+        heights = [figure.get('layout', {}).get('height') for figure in figures]
+        frame_files = {}
+        frame_urls = [None] * len(figures)
+        if self.lazy_frames:
+            for i, figure in enumerate(figures):
+                if figure.get('frames'):
+                    figures[i], frame_urls[i] = split_frames(figure, frames_url, frame_files)
+        counts = {}
+        for figure in figures:
+            count_values(figure, counts)
+        shared = SharedTable(counts)
+        figures = [shared.share_children(figure) for figure in figures]
+
+        html = []
+        n_figures = 0
+        for part in self.parts:
+            if not isinstance(part, dict):
+                html.append(part)
+                continue
+            if n_figures == 0:
+                # plotly.js and the shared table are loaded right before the first figure, so the text above it shows first
+                html.append('<script charset="utf-8" src="https://cdn.plot.ly/plotly-' + get_plotlyjs_version() + '.min.js"></script>')
+                html.append(expand_script)
+                if any(frame_urls):
+                    html.append(lazy_frames_script)
+                html.append('<script>var omscsShared=' + script_json(shared.values) + ';</script>')
+            html.append(figure_html('omscs-figure-' + str(n_figures), figures[n_figures], heights[n_figures],
+                                    part['auto_play'], frame_urls[n_figures]))
+            n_figures += 1
+        return ''.join(html), frame_files
+
+    # Write the page to 'path' (and the frame files to the 'path_frames' folder when the frames are loaded lazily),
+    # plus '.gz' and '.br' copies of each file for the given precompressed formats
+    def write(self, path, precompress=()):
+        frames_dir = os.path.splitext(path)[0] + '_frames'
+        html, frame_files = self.render(os.path.basename(frames_dir))
+        if self.lazy_frames:
+            # the frame files of previous runs are not needed anymore
+            shutil.rmtree(frames_dir, ignore_errors=True)
+            os.makedirs(frames_dir)
+            for name, text in frame_files.items():
+                write_file(os.path.join(frames_dir, name), text.encode('utf-8'), precompress)
+        html = html.encode('utf-8')
+        write_file(path, html, precompress)
+        return len(html)
+
+
+def write_file(path, data, precompress=()):
+    with open(path, 'wb') as f:
+        f.write(data)
+    if 'gzip' in precompress:
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if 'br' in precompress:
+        if brotli is None:
+            raise RuntimeError('brotli is not installed, cannot write ' + path + '.br')
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data))
+
+
+# Move the frames of 'figure' into frame files named after the hash of their content (added to 'frame_files'), and
+# return the figure with placeholder frames together with the urls of its frames
+def split_frames(figure, frames_url, frame_files):
+    urls = {}
+    for frame in figure['frames']:
+        text = dumps(frame)
+        name = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16] + '.json'
+        frame_files[name] = text
+        urls[frame['name']] = frames_url + '/' + name
+    layout = dict(figure.get('layout', {}))
+    menus = []
+    for menu in layout.get('updatemenus', []):
+        buttons = []
+        for button in menu.get('buttons', []):
+            # the play button (which animates all the frames) loads the frames itself before playing them
+            if button.get('method') == 'animate' and button.get('args', [''])[0] is None:
+                button = dict(button, method='skip')
+            buttons.append(button)
+        menus.append(dict(menu, buttons=buttons))
+    if menus:
+        layout['updatemenus'] = menus
+    figure = dict(figure, layout=layout, frames=[{'name': frame['name']} for frame in figure['frames']])
+    return figure, urls
+
+
+# JSON that is safe to put inside a <script> tag
+def script_json(value):
+    return dumps(value).replace('</', '<\\/')
+
+
+def figure_html(div_id, figure, height, auto_play, frame_urls=None):
+    height = str(height) + 'px' if isinstance(height, (int, float)) else '100%'
+    script = ('Plotly.newPlot("' + div_id + '", omscsExpand(' + script_json(figure.get('data', [])) + '), '
+              'omscsExpand(' + script_json(figure.get('layout', {})) + '), {"responsive": true})')
+    if figure.get('frames'):
+        script += '.then(function() { return Plotly.addFrames("' + div_id + '", omscsExpand(' + script_json(figure['frames']) + ')); })'
+        if frame_urls:
+            script += '.then(function() { omscsLazyFrames("' + div_id + '", ' + script_json(frame_urls) + '); })'
+        elif auto_play:
+            script += '.then(function() { Plotly.animate("' + div_id + '", null); })'
+    return ('<div id="' + div_id + '" class="plotly-graph-div" style="height:' + height + '; width:100%;"></div>'
+            '<script>' + script + ';</script>')
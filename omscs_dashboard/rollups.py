@@ -0,0 +1,111 @@
+# Precomputed rollups ("cube") of the review scores at three levels:
+#     course   one row per course and semester
+#     dept     one row per department and semester
+#     all      one row per semester for all the courses
+# and, at every level, one all-time row (ordinal -1). Semesters are integer ordinals (see clean.semester_ordinals), so
+# the rows sort chronologically without parsing the semester names.
+# Each row keeps the number of reviews and the sums and sums of squares of each score. The scores are whole numbers, so
+# these moments are exact integers that can be added and subtracted: when the reviews of a course change, only the
+# rows of that course are recomputed, and the difference is added to the rows of its department and to the 'all' rows.
+# The rollups are kept in the state store between runs (see state_store.py).
+import numpy as np
+import pandas as pd
+
+from .aggregate import metrics
+from .clean import semester_ordinals, semester_names
+
+
+rollup_keys = ['level', 'key', 'ordinal']
+moment_columns = ['reviews'] + [metric + '_sum' for metric in metrics] + [metric + '_squares' for metric in metrics]
+
+# Ordinal of the all-time rows
+all_time = -1
+
+
+# The course rows of the rollups for the courses in 'names', from 'reviews' (course name -> list of
+# (semester, rating, difficulty, workload) tuples) and 'depts' (course name -> department)
+def course_rows(reviews, depts, names):
+    records = [(name, depts[name], review[0]) + tuple(review[1:]) for name in names for review in reviews.get(name, [])]
+    if not records:
+        return pd.DataFrame(columns=rollup_keys + ['dept'] + moment_columns).astype({'ordinal': 'int64'} | {column: 'int64' for column in moment_columns})
+    df = pd.DataFrame(records, columns=['key', 'dept', 'semester'] + metrics)
+    scores = df[metrics].to_numpy(dtype=np.int64)
+    df = df[['key', 'dept']].assign(ordinal=semester_ordinals(df['semester']), reviews=1)
+    for j, metric in enumerate(metrics):
+        df[metric + '_sum'] = scores[:, j]
+        df[metric + '_squares'] = scores[:, j] ** 2
+    # (reviews without a known semester only count for all time)
+    rows = pd.concat([df[df['ordinal'] != all_time], df.assign(ordinal=all_time)])
+    rows = rows.groupby(['key', 'dept', 'ordinal'], sort=False)[moment_columns].sum().reset_index()
+    return rows.assign(level='course')[rollup_keys + ['dept'] + moment_columns]
+
+
+# The department and 'all' rows that sum up the given course rows
+def roll_up(rows):
+    dept_rows = rows.groupby(['dept', 'ordinal'], sort=False)[moment_columns].sum().reset_index()
+    dept_rows = dept_rows.assign(level='dept', key=dept_rows['dept'])
+    all_rows = rows.groupby('ordinal', sort=False)[moment_columns].sum().reset_index().assign(level='all', key='', dept=None)
+    return pd.concat([dept_rows, all_rows])[rollup_keys + ['dept'] + moment_columns]
+
+
+# The course rows of each course in 'rows', as a set of tuples, to compare them whatever their order
+def row_sets(rows):
+    sets = {}
+    for key, dept, *values in rows[['key', 'dept', 'ordinal'] + moment_columns].itertuples(index=False, name=None):
+        sets.setdefault(key, set()).add((dept, *(int(value) for value in values)))
+    return sets
+
+
+# Bring the rollups in the state store 'conn' up to date with 'reviews' and 'depts' (the courses of the page), and return
+# them. The course rows of every course are computed from its reviews (which is cheap, they are sums), and only the
+# courses whose rows differ from the saved ones, per semester (or that are new, or gone from the page), change the
+# department and 'all' rows. Only the rows that changed are written back.
+def update_rollups(conn, reviews, depts):
+    from .state_store import load_rollups, save_rollups
+
+    # (courses without a department are rolled up under '')
+    depts = {name: dept if isinstance(dept, str) else '' for name, dept in depts.items()}
+    cube = load_rollups(conn)
+    current, saved = row_sets(course_rows(reviews, depts, list(depts))), row_sets(cube[cube['level'] == 'course'])
+    changed = [name for name in depts if current.get(name) != saved.get(name)]
+    gone = [name for name in saved if name not in depts]
+    if not changed and not gone:
+        return cube
+
+    is_old = (cube['level'] == 'course') & cube['key'].isin(changed + gone)
+    old, new = cube[is_old], course_rows(reviews, depts, changed)
+    # the rows of the departments and of 'all' change by the new rows of the courses minus their old rows
+    # (removed courses have no new rows, and new courses no old rows)
+    totals = []
+    if len(old):
+        old_totals = roll_up(old)
+        old_totals[moment_columns] *= -1
+        totals.append(old_totals)
+    if len(new):
+        totals.append(roll_up(new))
+    if not totals:
+        return cube
+    delta = pd.concat(totals)
+
+    updated = pd.concat([cube[~is_old], new, delta])
+    updated = updated.groupby(rollup_keys, sort=False).agg({'dept': 'first'} | {column: 'sum' for column in moment_columns}).reset_index()
+    touched = pd.concat([old[rollup_keys], new[rollup_keys], delta[rollup_keys]]).drop_duplicates()
+    touched = touched.merge(updated, on=rollup_keys, how='left')
+    # (rows left without any review are removed)
+    is_empty = touched['reviews'].fillna(0) == 0
+    save_rollups(conn, touched[~is_empty], touched[is_empty])
+    return updated[updated['reviews'] > 0].reset_index(drop=True)
+
+
+# One level of the rollups with the mean and standard deviation of each score and the semester names, sorted by key
+# and semester (the all-time rows first)
+def rollup_table(cube, level):
+    df = cube[cube['level'] == level].sort_values(['key', 'ordinal'], kind='stable')
+    table = df[['key', 'dept', 'ordinal']].assign(semester=semester_names(df['ordinal']), reviews=df['reviews'])
+    n = df['reviews'].to_numpy(dtype=float)
+    for metric in metrics:
+        sums, squares = df[metric + '_sum'].to_numpy(dtype=float), df[metric + '_squares'].to_numpy(dtype=float)
+        table[metric] = sums / n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table[metric + '_std'] = np.sqrt(np.maximum(squares - sums ** 2 / n, 0) / (n - 1))
+    return table.reset_index(drop=True)
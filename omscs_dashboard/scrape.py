@@ -0,0 +1,187 @@
+# libraries for fetching the course review pages concurrently
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+import time
+
+# shared HTTP layer with connection reuse, caching and retries
+from .fetch import fetch, FetchError, HostRateLimiter
+
+# for aggregating the reviews by semester while they are parsed
+from .aggregate import SemesterAggregator
+
+# for reporting the time spent in each stage
+from . import metrics
+
+
+# Number of review pages fetched at the same time
+max_workers = 8
+
+# Number of requests per second sent to a single host at first (None for no limit), and the most it can adapt up to
+# while the host keeps answering (it slows down again when the host rate limits the requests, see fetch.HostRateLimiter)
+requests_per_second = 4
+max_requests_per_second = 8
+
+
+# The page at 'url', or the FetchError if it could not be fetched even after retrying
+def fetch_page(url, rate_limiter):
+    try:
+        return fetch(url, rate_limiter)
+    except FetchError as e:
+        return e
+
+
+# Fetch all the urls with a bounded pool of worker threads
+# Yields the position in 'urls' and the page (or FetchError) of each url as soon as it is ready, so a page is never held
+# back by a slower one before it. If the caller stops early (e.g. interrupted), the pages that were not started yet are
+# not fetched.
+def fetch_pages(urls, max_workers=max_workers, requests_per_second=requests_per_second,
+                max_requests_per_second=max_requests_per_second):
+    rate_limiter = HostRateLimiter(requests_per_second, max_requests_per_second)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(fetch_page, url, rate_limiter): i for i, url in enumerate(urls)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+info_class = 'inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium bg-green-100 text-green-800'
+
+
+# Turn the semester and the texts of the info badges of one review into a (semester, rating, difficulty, workload) tuple
+# Returns None for reviews without a known semester or without all three numbers
+def review_tuple(semester, info_texts):
+    semester = semester.title()
+    if semester == "Unknown Semester":
+        return None
+    rating = difficulty = workload = ''
+    for info_text in info_texts:
+        if "Rating" in info_text:
+            rating = info_text.split(' / ')[0][8:]
+        if "Difficulty" in info_text:
+            difficulty = info_text.split(' / ')[0][12:]
+        if "Workload" in info_text:
+            workload = info_text.split(' hours / ')[0][10:]
+    if ((rating.isdigit()) & (difficulty.isdigit()) & (workload.isdigit())):
+        return (semester, float(rating), float(difficulty), float(workload))
+    return None
+
+
+# Single pass extractor for the reviews in a review page
+# Instead of building the whole document tree and searching it again for every <li>, this only keeps the text of the
+# semester and info <span>s of the review that is currently being read
+class ReviewExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.reviews = []
+        self.items = []          # [semester, info texts] of every <li> that is currently open
+        self.capture = None      # 'semester' or 'info' while inside one of the spans we want the text of
+        self.span_depth = 0
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'li':
+            self.items.append([None, []])
+        elif tag == 'span' and self.items:
+            if self.capture:
+                self.span_depth += 1
+                return
+            css_class = dict(attrs).get('class') or ''
+            if css_class == info_class:
+                self.capture = 'info'
+            elif self.items[-1][0] is None and 'capitalize' in css_class.split():
+                self.capture = 'semester'
+
+    def handle_endtag(self, tag):
+        if tag == 'span' and self.capture:
+            if self.span_depth:
+                self.span_depth -= 1
+                return
+            text = ''.join(self.text)
+            if self.capture == 'semester':
+                self.items[-1][0] = text
+            else:
+                self.items[-1][1].append(text)
+            self.capture = None
+            self.text = []
+        elif tag == 'li' and self.items:
+            semester, info_texts = self.items.pop()
+            if semester is not None:
+                review = review_tuple(semester, info_texts)
+                if review:
+                    self.reviews.append(review)
+
+    def handle_data(self, data):
+        if self.capture:
+            self.text.append(data)
+
+
+# Extract (semester, rating, difficulty, workload) tuples from a review page in one pass
+def extract_reviews(page):
+    if isinstance(page, bytes):
+        page = page.decode('utf-8', errors='replace')
+    extractor = ReviewExtractor()
+    extractor.feed(page)
+    extractor.close()
+    return extractor.reviews
+
+
+# Same as extract_reviews, but by searching the full BeautifulSoup document tree (the original way of parsing the pages)
+# Kept as the reference implementation for the parser benchmark
+def extract_reviews_soup(page):
+    # Read the contents of the file into 'html'
+    html = BeautifulSoup(page, 'html.parser')
+
+    reviews = []
+    for item in html.find_all("li"):
+        spans = item.find_all("span", {'class' : 'capitalize'})
+        if (spans):
+            infos = item.find_all("span", {'class' : info_class})
+            review = review_tuple(spans[0].text, [info.text for info in infos])
+            if review:
+                reviews.append(review)
+    return reviews
+
+
+# For Each Course, Scrape All Review Info and Aggregate Rating, Difficulty, Workload by Semester
+# The courses are parsed and aggregated in the order their pages arrive
+# Returns the aggregates of all the courses indexed by name and semester, in the order of 'names', and the list of the
+# names of the courses whose review page could not be fetched, also in the order of 'names' (they are left out of the
+# aggregates)
+# If a 'reviews' dict is given, the (semester, rating, difficulty, workload) tuples of each course are also kept in it by name
+# If a 'checkpoint' function is given, it is called with the name, review tuples and aggregates of each course as soon
+# as the course is done, so that its progress can be saved before the others are (see pipeline.semester_aggregates)
+# The time spent parsing and aggregating each page is reported to metrics.py separately from the time spent waiting for it
+def scrape_courses(names, urls, max_workers=max_workers, requests_per_second=requests_per_second, reviews=None,
+                   checkpoint=None):
+    names = list(names)
+    aggregator = SemesterAggregator()
+    failed = []
+    waiting_since = time.perf_counter()
+    for i, page in fetch_pages(urls, max_workers, requests_per_second):
+        name = names[i]
+        if isinstance(page, FetchError):
+            print(name + ': ' + str(page))
+            failed.append(name)
+            waiting_since = time.perf_counter()
+            continue
+        started = time.perf_counter()
+        with metrics.nested('parse'):
+            course_reviews = extract_reviews(page)
+        parsed = time.perf_counter()
+        with metrics.nested('aggregate'):
+            aggregator.add_reviews(name, course_reviews)
+        if reviews is not None:
+            reviews[name] = course_reviews
+        if checkpoint is not None:
+            with metrics.nested('store'):
+                checkpoint(name, course_reviews, aggregator.to_frame([name]))
+        metrics.add_rows(len(course_reviews), 'parse')
+        metrics.add_course(name=name, wait_seconds=started - waiting_since, parse_seconds=parsed - started,
+                           aggregate_seconds=time.perf_counter() - parsed, page_bytes=len(page), reviews=len(course_reviews))
+        print(name)
+        waiting_since = time.perf_counter()
+    positions = {name: i for i, name in enumerate(names)}
+    return aggregator.to_frame(names), sorted(failed, key=positions.get)
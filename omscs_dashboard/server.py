@@ -0,0 +1,386 @@
+# Long-running dashboard server, as an alternative to the static page:
+#     python -m omscs_dashboard serve [--port 8050] [--refresh 1800] [--figures scatter,semester] ...
+# It runs the same stages as the build (see pipeline.py) in a background thread every 'refresh' seconds, keeps the
+# course table and the per-semester table in memory, and serves
+#     /                             a small page that loads the figures below and has a form for the filters
+#     /api/figures/<group>?filters  the figures of one group (see figures.py) as JSON, for Plotly.newPlot
+#     /api/courses?filters          the course table as JSON records
+#     /api/rollups/<level>?filters  the review scores per department ('dept') or for all courses ('all') and semester,
+#                                   from the rollups (see rollups.py), as JSON records
+# where the filters are
+#     dept=CS,CSE         only the courses of these departments
+#     min_reviews=20      only the courses with at least this many reviews
+#     from=Fall 2019      only the semesters from / up to this one in the semester plots
+#     to=Spring 2023
+# (plotly and pandas are imported when the data is first loaded, so importing this module is cheap)
+# Filtered views are built from the tables in memory, never by scraping again: the figures of every group are built once
+# per refresh on the whole data, and a filtered view only restricts their JSON to the selected courses and semesters
+# (see figures.restrict_figure) instead of building them again. Every response is kept in memory (for
+# the last 'cache_size' different requests) with its compressed copies, and has an ETag made from the hash of the data
+# and the request, so a browser that already has it gets an empty 304 without the figures being built again.
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+import gzip
+import hashlib
+import json
+import threading
+import time
+import traceback
+
+from .figures import figure_groups, default_figures, figure_builders, semester_groups, restrict_figure
+from .pipeline import load_data, page_data, page_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+default_host = '127.0.0.1'
+default_port = 8050
+
+# Scrape OMS Central again every 30 minutes, like the scheduled update of the static page
+default_refresh_seconds = 30 * 60
+
+# Number of different responses (path and filters) kept in memory
+cache_size = 256
+
+# Compression levels of the responses, which are compressed while the request waits (brotli's default level 11 takes
+# several times as long as building a filtered figure, for a few percent smaller responses)
+gzip_level = 6
+brotli_quality = 5
+
+
+class FilterError(ValueError):
+    pass
+
+
+# The filters of a query string, normalized so that equivalent queries give the same cache key
+def parse_filters(query):
+    from .clean import semester_ordinals
+
+    values = {key: items[-1].strip() for key, items in parse_qs(query).items() if items[-1].strip()}
+    filters = {}
+    if 'dept' in values:
+        filters['dept'] = ','.join(sorted({dept.strip() for dept in values['dept'].split(',') if dept.strip()}))
+    if 'min_reviews' in values:
+        if not values['min_reviews'].isdigit():
+            raise FilterError('min_reviews must be a whole number')
+        filters['min_reviews'] = str(int(values['min_reviews']))
+    for key in ['from', 'to']:
+        if key in values:
+            if semester_ordinals([values[key].title()])[0] < 0:
+                raise FilterError(key + ' must be a semester like "Fall 2019"')
+            filters[key] = values[key].title()
+    return filters
+
+
+# The data of the figures (see figures.py) with only the courses and semesters selected by 'filters'
+def filter_data(data, filters):
+    from .clean import semester_ordinals
+
+    df_plot = data['df_plot']
+    if 'dept' in filters:
+        df_plot = df_plot[df_plot['dept'].isin(filters['dept'].split(','))]
+    if 'min_reviews' in filters:
+        df_plot = df_plot[df_plot['reviewCount'] >= int(filters['min_reviews'])]
+    filtered = {'df_plot': df_plot}
+    if 'df_plot_semester' in data:
+        df_plot_semester = data['df_plot_semester']
+        df_plot_semester = df_plot_semester[df_plot_semester['name'].isin(df_plot['name'])]
+        if 'from' in filters:
+            df_plot_semester = df_plot_semester[df_plot_semester['ordinal'] >= semester_ordinals([filters['from']])[0]]
+        if 'to' in filters:
+            df_plot_semester = df_plot_semester[df_plot_semester['ordinal'] <= semester_ordinals([filters['to']])[0]]
+        filtered['df_plot_semester'] = df_plot_semester
+    return filtered
+
+
+# The parts of the figures of the groups in 'figures' built on the whole data, as compact plain JSON (see
+# render.plain_json), which the filtered views restrict
+def figure_sources(figures, data):
+    from .render import plain_json, compact, float_decimals
+
+    return {group: [part if isinstance(part, str) else compact(plain_json(part), float_decimals)
+                    for part in figure_builders[group](data)]
+            for group in figures}
+
+
+# The rows of a level of the rollups (see rollups.rollup_table) of the departments and semesters selected by 'filters'
+# (the all-time rows are kept whatever the semester range)
+def filter_rollups(rollups, level, filters):
+    import pandas as pd
+    from .clean import semester_ordinals
+
+    selected = pd.Series(True, index=rollups.index)
+    if level == 'dept' and 'dept' in filters:
+        selected &= rollups['key'].isin(filters['dept'].split(','))
+    if 'from' in filters:
+        selected &= (rollups['ordinal'] < 0) | (rollups['ordinal'] >= semester_ordinals([filters['from']])[0])
+    if 'to' in filters:
+        selected &= (rollups['ordinal'] < 0) | (rollups['ordinal'] <= semester_ordinals([filters['to']])[0])
+    return rollups[selected]
+
+
+# One response body with its ETag and compressed copies
+class Response:
+    def __init__(self, body, content_type, etag):
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self.encoded = {'gzip': gzip.compress(body, compresslevel=gzip_level, mtime=0)}
+        if brotli is not None:
+            self.encoded['br'] = brotli.compress(body, quality=brotli_quality)
+
+    # The body in the best encoding the client accepts, and the name of the encoding (None for none)
+    def encode(self, accept_encoding):
+        accepted = {encoding.split(';')[0].strip() for encoding in accept_encoding.split(',')}
+        for encoding in ['br', 'gzip']:
+            if encoding in accepted and encoding in self.encoded:
+                return self.encoded[encoding], encoding
+        return self.body, None
+
+
+# The data in memory and the responses built from it
+class Dashboard:
+    def __init__(self, figures=default_figures, replay=None, refresh_seconds=default_refresh_seconds):
+        self.figures = [group for group in figure_groups if group in figures]
+        self.replay = replay
+        self.refresh_seconds = refresh_seconds
+        self.data = None
+        self.sources = None
+        self.data_hash = None
+        self.updated = None
+        self.responses = OrderedDict()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    # Scrape OMS Central (only the courses whose review count changed, see pipeline.semester_aggregates) and replace the
+    # data in memory if it changed. Returns True if it did.
+    def refresh(self):
+        from .fetch import reset_stats
+        from .metrics import reset
+        from .state_store import open_state, state_path, content_hash
+
+        started = time.perf_counter()
+        # (the metrics of the stages are only kept for the last refresh)
+        reset()
+        reset_stats()
+        # (the connection is only used by the thread that runs the refresh)
+        state = open_state(':memory:' if self.replay else state_path)
+        try:
+            df_plot, course_reviews_df_all, reviews, cube = load_data(self.figures, state, self.replay)
+            data_hash = content_hash(df_plot, course_reviews_df_all, options=json.dumps(self.figures))
+            if data_hash == self.data_hash:
+                print('Refresh: the data has not changed')
+                return False
+            data = page_data(df_plot, reviews, cube)
+        finally:
+            state.close()
+        sources = figure_sources(self.figures, data)
+        with self.lock:
+            self.data, self.sources, self.data_hash, self.updated = data, sources, data_hash, page_header()
+            self.responses.clear()
+        # build the unfiltered views right away, they are the ones asked for the most
+        for group in self.figures:
+            self.response('/api/figures/' + group, {})
+        print('Refresh: %d courses, %.1fs' % (len(df_plot), time.perf_counter() - started))
+        return True
+
+    # Refresh every 'refresh_seconds' until stop() (a failed refresh keeps the data of the last one)
+    def refresh_loop(self):
+        while not self.stopped.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        self.refresh()
+        threading.Thread(target=self.refresh_loop, daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+
+    # The Response of the path (without the query) and filters, from the cache or built and cached
+    # Raises KeyError for unknown paths
+    def response(self, path, filters):
+        with self.lock:
+            data, sources, data_hash, updated = self.data, self.sources, self.data_hash, self.updated
+            key = path + '?' + urlencode(sorted(filters.items()))
+            etag = '"' + hashlib.sha256((data_hash + key).encode('utf-8')).hexdigest()[:32] + '"'
+            if key in self.responses:
+                self.responses.move_to_end(key)
+                return self.responses[key]
+
+        response = self.build_response(path, filters, data, sources, updated, etag)
+        with self.lock:
+            # (the data may have been refreshed in the meantime, then this response is not cached)
+            if data_hash == self.data_hash:
+                self.responses[key] = response
+                while len(self.responses) > cache_size:
+                    self.responses.popitem(last=False)
+        return response
+
+    def build_response(self, path, filters, data, sources, updated, etag):
+        from .render import dumps
+
+        if path == '/':
+            return Response(self.index_html(data, updated).encode('utf-8'), 'text/html; charset=utf-8', etag)
+        if path == '/api/courses':
+            df_plot = filter_data(data, filters)['df_plot']
+            return Response(df_plot.to_json(orient='records').encode('utf-8'), 'application/json', etag)
+        level = path[len('/api/rollups/'):] if path.startswith('/api/rollups/') else None
+        if level in data.get('rollups', {}):
+            rollups = filter_rollups(data['rollups'][level], level, filters)
+            return Response(rollups.to_json(orient='records').encode('utf-8'), 'application/json', etag)
+        group = path[len('/api/figures/'):] if path.startswith('/api/figures/') else None
+        if group not in self.figures:
+            raise KeyError(path)
+        filtered = filter_data(data, filters)
+        if filtered['df_plot'].empty or (group in semester_groups and filtered['df_plot_semester'].empty):
+            parts = ['<p>No courses match the filters.</p>']
+        else:
+            parts = [part if isinstance(part, str) or not filters else restrict_figure(part, data, filtered)
+                     for part in sources[group]]
+        return Response(dumps(parts).encode('utf-8'), 'application/json', etag)
+
+    # The page of the dashboard: the header of the static page, the filter form and the figures, loaded by index_script
+    def index_html(self, data, updated):
+        from plotly.offline import get_plotlyjs_version
+        from .clean import sort_semesters
+        from .render import dumps
+
+        df_plot = data['df_plot']
+        options = {'depts': sorted(df_plot['dept'].dropna().unique().tolist()), 'figures': self.figures, 'semesters': []}
+        if 'df_plot_semester' in data:
+            options['semesters'] = sort_semesters(data['df_plot_semester']['semester'])
+        return ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>OMSCS Course Rating and Difficulty</title>'
+                '<script charset="utf-8" src="https://cdn.plot.ly/plotly-' + get_plotlyjs_version() + '.min.js"></script>'
+                '</head><body>' + updated + index_form + '<div id="omscs-figures"></div>'
+                '<script>var omscsOptions=' + dumps(options).replace('</', '<\\/') + ';' + index_script + '</script>'
+                '</body></html>')
+
+
+index_form = '''<h3>Filters</h3>
+<form id="omscs-filters">
+  Departments <select name="dept" multiple size="4"></select>
+  Minimum reviews <input name="min_reviews" type="number" min="0" style="width: 5em">
+  Semesters from <select name="from"><option value=""></option></select>
+  to <select name="to"><option value=""></option></select>
+  <button type="submit">Apply</button>
+</form>'''
+
+# Fills the filter form from omscsOptions and the query string of the page, and (re)loads the figures of every group
+# from /api/figures with the filters of the form, which are also kept in the query string of the page
+index_script = '''
+(function() {
+  var form = document.getElementById('omscs-filters');
+  var container = document.getElementById('omscs-figures');
+  var params = new URLSearchParams(location.search);
+  function fill(select, values, selected) {
+    values.forEach(function(value) {
+      var option = document.createElement('option');
+      option.value = option.textContent = value;
+      option.selected = selected.indexOf(value) >= 0;
+      select.appendChild(option);
+    });
+  }
+  fill(form.dept, omscsOptions.depts, (params.get('dept') || '').split(','));
+  fill(form.from, omscsOptions.semesters, [params.get('from')]);
+  fill(form.to, omscsOptions.semesters, [params.get('to')]);
+  form.min_reviews.value = params.get('min_reviews') || '';
+
+  function query() {
+    var query = new URLSearchParams();
+    var depts = Array.from(form.dept.selectedOptions).map(function(option) { return option.value; });
+    if (depts.length) query.set('dept', depts.join(','));
+    ['min_reviews', 'from', 'to'].forEach(function(name) { if (form[name].value) query.set(name, form[name].value); });
+    return query.toString();
+  }
+
+  function load() {
+    var q = query();
+    history.replaceState(null, '', q ? '?' + q : location.pathname);
+    Promise.all(omscsOptions.figures.map(function(group) {
+      return fetch('/api/figures/' + group + (q ? '?' + q : '')).then(function(response) { return response.json(); });
+    })).then(function(groups) {
+      container.innerHTML = '';
+      groups.forEach(function(parts) {
+        parts.forEach(function(part) {
+          var div = document.createElement('div');
+          container.appendChild(div);
+          if (typeof part === 'string') {
+            div.innerHTML = part;
+            return;
+          }
+          Plotly.newPlot(div, part.data, part.layout, {responsive: true}).then(function() {
+            if (part.frames) return Plotly.addFrames(div, part.frames);
+          });
+        });
+      });
+    });
+  }
+
+  form.addEventListener('submit', function(event) { event.preventDefault(); load(); });
+  load();
+})();
+'''
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    dashboard = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            response = self.dashboard.response(url.path, parse_filters(url.query))
+        except FilterError as e:
+            return self.send_error(400, str(e))
+        except KeyError:
+            return self.send_error(404)
+        except Exception:
+            traceback.print_exc()
+            return self.send_error(500)
+
+        if self.headers.get('If-None-Match') == response.etag:
+            self.send_response(304)
+            self.send_header('ETag', response.etag)
+            self.end_headers()
+            return
+        body, encoding = response.encode(self.headers.get('Accept-Encoding', ''))
+        self.send_response(200)
+        self.send_header('Content-Type', response.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', response.etag)
+        # (the browser may keep the response, but has to check with the ETag that it is still current)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Build the data once, then serve the dashboard (and refresh it in the background) until interrupted
+def serve(figures=default_figures, host=default_host, port=default_port, refresh_seconds=default_refresh_seconds,
+          replay=None):
+    from .fetch import replay_from
+
+    if replay:
+        replay_from(replay)
+    dashboard = Dashboard(figures, replay, refresh_seconds)
+    dashboard.start()
+    handler = type('Handler', (DashboardHandler,), {'dashboard': dashboard})
+    server = ThreadingHTTPServer((host, port), handler)
+    print('Serving the dashboard on http://%s:%d/' % (host, server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dashboard.stop()
+        server.server_close()
+    return 0
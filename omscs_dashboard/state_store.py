@@ -0,0 +1,152 @@
+# Keeps the per-semester aggregates of every course between runs in a small SQLite file, together with the
+# review count OMS Central reported for the course when it was scraped.
+# Courses whose review count has not changed since then can reuse their aggregates instead of being scraped again.
+# Each course is saved as soon as it is scraped, so a run that is interrupted resumes with the courses it did not get to.
+# The individual reviews of each course are kept as well, for the review-level export (see export.py).
+# The rollups of the scores per course, department and semester (see rollups.py) are kept and updated there too.
+# It also keeps a hash of the data the last page was built from, so that a run with unchanged data can skip building it
+# (and the hash of a page built but not published yet, until it is).
+import hashlib
+import json
+import sqlite3
+
+# for data manipulation
+import pandas as pd
+
+from .aggregate import aggregate_columns
+from .rollups import rollup_keys, moment_columns
+
+
+state_path = 'omscs_state.sqlite'
+
+# Bump this whenever the layout of the stored aggregates changes, so that all courses are scraped again once
+state_version = 3
+
+
+def open_state(path=state_path):
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE IF NOT EXISTS courses (
+                        name TEXT PRIMARY KEY,
+                        review_count INTEGER NOT NULL,
+                        version INTEGER NOT NULL,
+                        aggregates TEXT NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS reviews (
+                        name TEXT PRIMARY KEY,
+                        reviews TEXT NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL)''')
+    conn.execute('CREATE TABLE IF NOT EXISTS rollups (level TEXT NOT NULL, key TEXT NOT NULL, ordinal INTEGER NOT NULL, '
+                 'dept TEXT, ' + ', '.join(column + ' INTEGER NOT NULL' for column in moment_columns) + ', '
+                 'PRIMARY KEY (level, key, ordinal))')
+    return conn
+
+
+# Split the courses into the ones that can be served from the state store and the ones that need to be scraped
+# 'review_counts' maps each course name to its current review count on OMS Central
+# Returns the cached aggregates of the unchanged courses (indexed by name and semester) and the list of changed course names
+def load_cached(conn, review_counts):
+    cached = {}
+    for name, review_count, version, aggregates in conn.execute('SELECT name, review_count, version, aggregates FROM courses'):
+        if version == state_version and review_counts.get(name) == review_count:
+            cached[name] = json.loads(aggregates)
+
+    changed = [name for name in review_counts if name not in cached]
+    return aggregates_table([name for name in review_counts if name in cached], cached), changed
+
+
+# The saved aggregates of the courses in 'names' whatever their review count was (for courses that could not be
+# scraped again, see pipeline.semester_aggregates), indexed by name and semester
+def load_saved(conn, names):
+    saved = {}
+    for name in names:
+        row = conn.execute('SELECT aggregates FROM courses WHERE name = ? AND version = ?', (name, state_version)).fetchone()
+        if row:
+            saved[name] = json.loads(row[0])
+    return aggregates_table(list(saved), saved)
+
+
+# The aggregates of the courses in 'names' from 'records' (course name -> list of saved records), indexed by name and semester
+def aggregates_table(names, records):
+    df = pd.DataFrame([record for name in names for record in records[name]], columns=['name', 'semester'] + aggregate_columns)
+    df = df.astype({column: float for column in aggregate_columns} | {'reviewCount': int})
+    return df.set_index(['name', 'semester'])
+
+
+# Store the freshly scraped aggregates of the courses in 'review_counts' along with their review counts,
+# and their (semester, rating, difficulty, workload) review tuples from 'reviews' (course name -> list of tuples)
+def save_courses(conn, course_reviews_df, review_counts, reviews):
+    groups = dict(list(course_reviews_df.reset_index().groupby('name')))
+    with conn:
+        for name, review_count in review_counts.items():
+            records = groups[name].to_dict('records') if name in groups else []
+            conn.execute('INSERT OR REPLACE INTO courses VALUES (?, ?, ?, ?)',
+                         (name, int(review_count), state_version, json.dumps(records)))
+            # the scores are whole numbers, stored without the '.0' to keep the file small
+            course_reviews = [[review[0]] + [int(score) for score in review[1:]] for review in reviews.get(name, [])]
+            conn.execute('INSERT OR REPLACE INTO reviews VALUES (?, ?)', (name, json.dumps(course_reviews, separators=(',', ':'))))
+
+
+# The review tuples of the courses in 'names' (course name -> list of (semester, rating, difficulty, workload) tuples)
+def load_reviews(conn, names):
+    reviews = {}
+    for name in names:
+        row = conn.execute('SELECT reviews FROM reviews WHERE name = ?', (name,)).fetchone()
+        reviews[name] = [tuple(review) for review in json.loads(row[0])] if row else []
+    return reviews
+
+
+# The rollups saved by the last run (see rollups.py)
+def load_rollups(conn):
+    columns = rollup_keys + ['dept'] + moment_columns
+    return pd.read_sql_query('SELECT ' + ', '.join(columns) + ' FROM rollups', conn).astype({'ordinal': 'int64'} | {column: 'int64' for column in moment_columns})
+
+
+# Replace the rows of the rollups at the (level, key, ordinal) keys of 'removed' and 'changed' with the rows of 'changed'
+def save_rollups(conn, changed, removed):
+    with conn:
+        conn.executemany('DELETE FROM rollups WHERE level = ? AND key = ? AND ordinal = ?',
+                         removed[rollup_keys].itertuples(index=False, name=None))
+        columns = rollup_keys + ['dept'] + moment_columns
+        conn.executemany('INSERT OR REPLACE INTO rollups (' + ', '.join(columns) + ') VALUES (' + ', '.join('?' * len(columns)) + ')',
+                         [(level, key, int(ordinal), dept) + tuple(int(value) for value in values)
+                          for level, key, ordinal, dept, *values in changed[columns].itertuples(index=False, name=None)])
+
+
+# Hash of the course table and the per-semester aggregates (indexed by name and semester, or None when the page has no
+# semester plots) that the page is built from, and of the 'options' string of the other settings that change the page
+# The tables are normalized first (sorted rows and columns, floats rounded) so that the same data always gives the same
+# hash, whichever courses were reused from the state store and whichever were scraped
+def content_hash(df_plot, semester_df=None, options='', decimals=6):
+    digest = hashlib.sha256(options.encode('utf-8'))
+    tables = [df_plot.sort_values('name')]
+    if semester_df is not None:
+        tables.append(semester_df.reset_index().sort_values(['name', 'semester']))
+    for df in tables:
+        df = df[sorted(df.columns)].round(decimals)
+        digest.update(df.to_csv(index=False, lineterminator='\n').encode('utf-8'))
+    return digest.hexdigest()
+
+
+# Hash of the data of the last page that was built (None if no page was built with this state store yet)
+def last_content_hash(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = 'content_hash'").fetchone()
+    return row[0] if row else None
+
+
+# Save the hash of the data of the page just built, or with 'pending', of a page that is not published yet (see
+# commit_content_hash)
+def save_content_hash(conn, value, pending=False):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", ('pending_content_hash' if pending else 'content_hash', value))
+
+
+# Make the pending hash the hash of the last page built, once the page is published. Returns False if there was none.
+def commit_content_hash(conn):
+    with conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'pending_content_hash'").fetchone()
+        if row is None:
+            return False
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('content_hash', ?)", row)
+        conn.execute("DELETE FROM meta WHERE key = 'pending_content_hash'")
+    return True
@@ -0,0 +1,26 @@
+# The tests import the omscs_dashboard package from this checkout, and the synthetic OMS Central pages of
+# benchmarks/synthetic.py, which the data of the page is built from
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+
+# The data of the page (see pipeline.page_data) for 30 synthetic courses, without the network
+@pytest.fixture(scope='session')
+def data():
+    from omscs_dashboard.pipeline import course_table, page_data
+    from omscs_dashboard.rollups import update_rollups
+    from omscs_dashboard.scrape import extract_reviews
+    from omscs_dashboard.state_store import open_state
+    from synthetic import make_courses, make_reviews_html
+
+    df_plot = course_table(pd.DataFrame(make_courses(30)))
+    reviews = {name: extract_reviews(make_reviews_html(5 + 3 * i, seed=i)) for i, name in enumerate(df_plot['name'])}
+    cube = update_rollups(open_state(':memory:'), reviews, dict(zip(df_plot['name'], df_plot['dept'])))
+    return page_data(df_plot, reviews, cube)
@@ -0,0 +1,73 @@
+# The streaming per-semester aggregation (see aggregate.py) against pandas on the whole table of reviews
+import numpy as np
+import pandas as pd
+
+from omscs_dashboard.aggregate import SemesterAggregator, metrics
+
+
+def make_reviews(n, seed):
+    rng = np.random.default_rng(seed)
+    semesters = ['Spring 2020', 'Summer 2020', 'Fall 2020', 'Spring 2021']
+    return [(semesters[rng.integers(len(semesters))], float(rng.integers(1, 6)), float(rng.integers(1, 6)),
+             float(rng.integers(3, 40))) for _ in range(n)]
+
+
+def expected_table(reviews):
+    df = pd.DataFrame([(name,) + review for name, course_reviews in reviews for review in course_reviews],
+                      columns=['name', 'semester'] + metrics)
+    grouped = df.groupby(['name', 'semester'])
+    return grouped[metrics].mean(), grouped.size(), grouped[metrics].var(), grouped[metrics].median()
+
+
+def check(aggregator, reviews):
+    df = aggregator.to_frame().sort_index()
+    means, counts, variances, medians = expected_table(reviews)
+    assert list(df.index) == list(means.index)
+    assert (df['reviewCount'] == counts).all()
+    for metric in metrics:
+        np.testing.assert_allclose(df[metric], means[metric], rtol=1e-12)
+        np.testing.assert_allclose(df[metric + '_var'], variances[metric], rtol=1e-9, equal_nan=True)
+        np.testing.assert_array_equal(df[metric + '_median'], medians[metric])
+
+
+def test_same_as_pandas():
+    reviews = [('Course %d' % i, make_reviews(n, seed=i)) for i, n in enumerate([1, 2, 7, 50, 300])]
+    # (a small capacity, so that the arrays grow several times)
+    aggregator = SemesterAggregator(capacity=2)
+    for name, course_reviews in reviews:
+        aggregator.add_reviews(name, course_reviews)
+    check(aggregator, reviews)
+
+    # the rows of some of the courses only
+    df = aggregator.to_frame()
+    pd.testing.assert_frame_equal(aggregator.to_frame(['Course 3']), df.loc[['Course 3']])
+    pd.testing.assert_frame_equal(aggregator.to_frame(['Course 4', 'Course 0']), df.loc[['Course 4', 'Course 0']])
+    assert aggregator.to_frame(['Other']).empty
+
+
+def test_merging_batches_is_the_same_as_one_batch():
+    # the reviews of a course added in several batches are merged with Chan et al.'s formulas
+    course_reviews = make_reviews(500, seed=1)
+    aggregator = SemesterAggregator()
+    for start, end in [(0, 1), (1, 3), (3, 120), (120, 121), (121, 500)]:
+        aggregator.add_reviews('Course', course_reviews[start:end])
+    check(aggregator, [('Course', course_reviews)])
+
+    one_batch = SemesterAggregator()
+    one_batch.add_reviews('Course', course_reviews)
+    pd.testing.assert_frame_equal(aggregator.to_frame().sort_index(), one_batch.to_frame().sort_index(), rtol=1e-12)
+
+
+def test_large_offsets_keep_the_variance():
+    # a naive sum of squares loses the variance of large values with a small spread, Welford's updates do not
+    course_reviews = [('Fall 2020', 1e9 + x, 1.0, 1.0) for x in [4, 7, 13, 16]]
+    aggregator = SemesterAggregator()
+    for review in course_reviews:
+        aggregator.add_reviews('Course', [review])
+    assert aggregator.to_frame()['rating_var'].iloc[0] == 30.0
+
+
+def test_no_reviews():
+    aggregator = SemesterAggregator()
+    aggregator.add_reviews('Course', [])
+    assert aggregator.to_frame().empty
@@ -0,0 +1,131 @@
+# The Bayesian averages and bootstrap confidence intervals (see analytics.py) and the error bars of the plots
+import numpy as np
+import pandas as pd
+import pytest
+
+from omscs_dashboard import analytics
+from omscs_dashboard.aggregate import review_table, metrics
+from omscs_dashboard.analytics import bootstrap_intervals, course_estimates, semester_estimates, prior_weight, shrink
+from omscs_dashboard.pipeline import course_scores
+
+
+def make_reviews(n_courses, seed=0, max_reviews=40):
+    rng = np.random.default_rng(seed)
+    semesters = ['Spring 2020', 'Summer 2020', 'Fall 2020', 'Spring 2021']
+    reviews = {}
+    for i in range(n_courses):
+        n = int(rng.integers(1, max_reviews))
+        reviews['Course %d' % i] = [(semesters[rng.integers(len(semesters))], float(rng.integers(1, 6)),
+                                     float(rng.integers(1, 6)), float(rng.integers(3, 30))) for _ in range(n)]
+    return reviews
+
+
+def naive_intervals(values, counts, n_resamples, rng):
+    low, high = [], []
+    for group in np.split(values.astype(float), np.cumsum(counts)[:-1]):
+        means = np.array([group[rng.integers(0, len(group), len(group))].mean(axis=0) for _ in range(n_resamples)])
+        bounds = np.quantile(means, [0.05, 0.95], axis=0)
+        low.append(bounds[0])
+        high.append(bounds[1])
+    return np.array(low), np.array(high)
+
+
+def test_bootstrap_is_close_to_a_naive_bootstrap():
+    rng = np.random.default_rng(1)
+    counts = rng.integers(20, 60, 8)
+    values = np.stack([rng.integers(1, 6, counts.sum()), rng.integers(1, 6, counts.sum()),
+                       rng.integers(3, 40, counts.sum())], axis=1)
+    low, high = bootstrap_intervals(values, counts, n_resamples=4000)
+    expected_low, expected_high = naive_intervals(values, counts, 4000, rng)
+    # (within a few percent of the spread of the scores, as the two use different random draws)
+    spread = values.std(axis=0)
+    assert (np.abs(low - expected_low) < 0.05 * spread).all()
+    assert (np.abs(high - expected_high) < 0.05 * spread).all()
+
+
+def test_bootstrap_of_tiny_groups(monkeypatch):
+    # one review: the interval is the review, two reviews: the resampled means are a, (a + b) / 2 and b with
+    # probabilities 1/4, 1/2 and 1/4, so the 5% and 95% quantiles are a and b. The draws never leave their group.
+    # (one group per block)
+    monkeypatch.setattr(analytics, 'max_sums', 3 * 2000)
+    values = np.array([[3, 1, 10], [1, 5, 4], [4, 2, 20], [5, 5, 5], [5, 5, 5], [5, 5, 5]])
+    low, high = bootstrap_intervals(values, [1, 2, 3], n_resamples=2000)
+    np.testing.assert_array_equal(low, [[3, 1, 10], [1, 2, 4], [5, 5, 5]])
+    np.testing.assert_array_equal(high, [[3, 1, 10], [4, 5, 20], [5, 5, 5]])
+
+
+def test_packed_columns_are_the_same_as_single_columns(monkeypatch):
+    # large scores need more than 63 bits in total, so they are packed into several columns
+    rng = np.random.default_rng(2)
+    counts = rng.integers(1, 30, 50)
+    values = np.stack([rng.integers(0, 2 ** 20, counts.sum()), rng.integers(-5, 6, counts.sum()),
+                       rng.integers(0, 2 ** 30, counts.sum())], axis=1)
+    # (small chunks of resamples, so that there are several, and all the groups in one block, so that the draws are the
+    # same whatever the number of columns)
+    monkeypatch.setattr(analytics, 'max_elements', 2 ** 12)
+    monkeypatch.setattr(analytics, 'max_sums', 2 ** 18)
+    low, high = bootstrap_intervals(values, counts, n_resamples=1000, rng=np.random.default_rng(0))
+    for j in range(values.shape[1]):
+        column_low, column_high = bootstrap_intervals(values[:, [j]], counts, n_resamples=1000, rng=np.random.default_rng(0))
+        np.testing.assert_allclose(low[:, j], column_low[:, 0], rtol=1e-12)
+        np.testing.assert_allclose(high[:, j], column_high[:, 0], rtol=1e-12)
+    assert (low <= high).all()
+
+
+def test_bootstrap_needs_whole_numbers():
+    with pytest.raises(ValueError):
+        bootstrap_intervals(np.array([[1.5, 2.0]]), [1])
+
+
+def test_shrinkage():
+    counts = np.array([1, 10, 1000])
+    means = np.array([[5.0], [5.0], [5.0]])
+    prior_means = np.full((3, 1), 3.0)
+    shrunk = shrink(counts, means, prior_means, np.array([10.0]))[:, 0]
+    np.testing.assert_allclose(shrunk, [(5 + 30) / 11, 4, (5000 + 30) / 1010])
+    np.testing.assert_allclose(shrink(counts, means, prior_means, np.array([0.0])), means)
+
+    # groups with the same true mean are shrunk a lot, groups with very different means hardly at all
+    rng = np.random.default_rng(3)
+    counts = np.full(200, 10)
+    same = rng.normal(3, 1, (200, 10))
+    different = same + rng.normal(0, 3, (200, 1))
+    for samples, expected in [(same, lambda weight: weight > 50), (different, lambda weight: weight < 1)]:
+        weight = prior_weight(counts, samples.mean(axis=1)[:, None], samples.var(axis=1, ddof=1)[:, None], np.full((200, 1), 3.0))
+        assert expected(weight[0])
+
+
+def test_estimates():
+    reviews = make_reviews(20, seed=4)
+    reviews_df = review_table(reviews, list(reviews))
+    course_df = course_estimates(reviews_df, n_resamples=1000)
+    semester_df = semester_estimates(reviews_df, course_df, n_resamples=1000)
+    assert list(course_df.index) == list(reviews)
+    assert semester_df['reviews'].sum() == course_df['reviews'].sum() == len(reviews_df)
+    for df in [course_df, semester_df]:
+        for metric in metrics:
+            assert (df[metric + '_low'] <= df[metric + '_mean']).all() and (df[metric + '_mean'] <= df[metric + '_high']).all()
+            assert (df[metric + '_shrunk_low'] <= df[metric + '_shrunk']).all()
+            assert (df[metric + '_shrunk'] <= df[metric + '_shrunk_high']).all()
+
+
+def test_course_scores_are_inside_their_error_bars():
+    reviews = make_reviews(30)
+    # the last course has a workload far above the others, and one course has no reviews
+    reviews['Course 29'] = [('Fall 2020', 4.0, 4.0, 200.0)] * 30
+    names = list(reviews) + ['No reviews']
+    df_plot = pd.DataFrame({'name': names, 'reviewCount': 10, 'rating': 3.0, 'difficulty': 3.0, 'workload': 10.0})
+    course_df = course_estimates(review_table(reviews, names[:-1]), n_resamples=2000)
+    df = course_scores(df_plot, course_df)
+
+    estimated = (df['name'] != 'No reviews').to_numpy()
+    for metric in metrics:
+        errors = df[[metric + '_error', metric + '_error_minus']]
+        has_bars = errors.notna().all(axis=1).to_numpy()
+        assert (errors[has_bars] >= 0).all().all()
+        np.testing.assert_allclose(df.loc[has_bars, metric], course_df[metric + '_shrunk'].reindex(df['name'])[has_bars], rtol=1e-6)
+        assert not has_bars[~estimated].any()
+    # (the capped workload has no error bar, its other scores keep theirs)
+    capped = df[df['name'] == 'Course 29'].iloc[0]
+    assert capped['workload'] < 200 and np.isnan(capped['workload_error']) and not np.isnan(capped['rating_error'])
+    assert df[df['name'] == 'No reviews'].iloc[0][metrics].tolist() == [3.0, 3.0, 10.0]
@@ -0,0 +1,37 @@
+# The vectorized course cleaning (see clean.py)
+import pandas as pd
+
+from omscs_dashboard.clean import clean_courses, cap_outliers, treemap_label
+
+
+def raw_course(name, code, tags, review_count=10, workload=10.0):
+    return {'name': name, 'codes': [code], 'tags': tags, 'description': '', 'reviewCount': review_count,
+            'rating': 4.0, 'difficulty': 3.0, 'workload': workload}
+
+
+def test_clean_courses():
+    raw_df = pd.DataFrame([raw_course('Machine Learning for Trading', 'CS-7646', ['ML4T']),
+                           raw_course('Graduate Algorithms', 'CS-6515', []),
+                           raw_course('Intro to Health Informatics', 'CS-6440', None),
+                           raw_course('Data and Visual Analytics', 'CSE-6242', [], review_count=4),
+                           raw_course('Simulation', 'ISYE-6644', ['SIM'])])
+    df = clean_courses(raw_df, min_review_count=5)
+    assert list(df['name']) == ['Machine Learning for Trading', 'Graduate Algorithms', 'Intro to Health Informatics', 'Simulation']
+    assert list(df['code']) == ['CS-7646', 'CS-6515', 'CS-6440', 'ISYE-6644']
+    assert list(df['dept']) == ['CS', 'CS', 'CS', 'ISYE']
+    # the tag from OMS Central when there is one, the initials of the capitalized words of the name otherwise
+    assert list(df['tag']) == ['ML4T', 'GA', 'IHI', 'SIM']
+
+
+def test_cap_outliers():
+    df = pd.DataFrame({'workload': [10.0, 11, 12, 13, 14, 15, 16, 80]})
+    assert list(cap_outliers(df.copy())['workload']) == [10, 11, 12, 13, 14, 15, 16, 16]
+    # nothing above the fence, nothing changes
+    df = pd.DataFrame({'workload': [10.0, 11, 12, 13, 14, 15, 16, 25]})
+    assert list(cap_outliers(df.copy())['workload']) == list(df['workload'])
+
+
+def test_treemap_label():
+    df = pd.DataFrame({'tag': ['A', 'B'], 'rating': [4.12345, 3.0005]})
+    assert list(treemap_label(df, 'rating')) == ['A<br><br>' + str(round(4.12345, 3)), 'B<br><br>' + str(round(3.0005, 3))]
+
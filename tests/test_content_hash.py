@@ -0,0 +1,73 @@
+# The hash of the data and options of the page, and the skipped builds (see state_store.content_hash and pipeline.build)
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from omscs_dashboard import pipeline, state_store
+from omscs_dashboard.pipeline import build, commit_hash, course_table, unchanged_exit_status
+from omscs_dashboard.state_store import content_hash
+from synthetic import make_courses
+
+
+def test_same_data_same_hash():
+    df = pd.DataFrame({'name': ['B', 'A', 'C'], 'rating': [4.1, 3.2, 2.5], 'reviewCount': [10, 20, 30]})
+    semester_df = pd.DataFrame({'name': ['A', 'A', 'B'], 'semester': ['Fall 2020', 'Spring 2021', 'Fall 2020'],
+                                'rating': [3.0, 3.5, 4.0]}).set_index(['name', 'semester'])
+    expected = content_hash(df, semester_df)
+    # whatever the order of the rows and columns, and below the rounding of the floats
+    shuffled = df.iloc[[2, 0, 1]][['reviewCount', 'rating', 'name']]
+    assert content_hash(shuffled, semester_df.iloc[::-1]) == expected
+    assert content_hash(df.assign(rating=df['rating'] + 1e-9), semester_df) == expected
+
+    assert content_hash(df.assign(rating=df['rating'] + 1e-3), semester_df) != expected
+    assert content_hash(df, semester_df.iloc[1:]) != expected
+    assert content_hash(df) != expected
+    assert content_hash(df, semester_df, options='other') != expected
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # a course table without the network, and a state store in a temporary folder
+    df_plot = course_table(pd.DataFrame(make_courses(20)))
+    monkeypatch.setattr(pipeline, 'load_data', lambda *args, **kwargs: (df_plot.copy(), None, None, None))
+    monkeypatch.setattr(state_store, 'state_path', str(tmp_path / 'state.sqlite'))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_build_is_skipped_only_when_nothing_changed(workdir):
+    figures = ['scatter']
+    assert build(figures, output='page.html', jobs=1) == 0
+    assert build(figures, output='page.html', jobs=1) == unchanged_exit_status
+
+    # other options, or a page that is gone, build the page again
+    assert build(figures, output='other.html', jobs=1) == 0
+    assert os.path.exists('other.html')
+    assert build(figures, output='other.html', precompress=['gzip'], jobs=1) == 0
+    assert os.path.exists('other.html.gz')
+    os.remove('other.html.gz')
+    assert build(figures, output='other.html', precompress=['gzip'], jobs=1) == 0
+    assert build(figures, output='other.html', precompress=['gzip'], jobs=1) == unchanged_exit_status
+    assert build(['scatter', 'treemap'], output='other.html', precompress=['gzip'], jobs=1) == 0
+    assert build(['scatter', 'treemap'], output='other.html', precompress=['gzip'], jobs=1, force=True) == 0
+
+
+def test_deferred_hash_is_only_used_once_committed(workdir):
+    figures = ['scatter']
+    assert commit_hash() == 1
+    assert build(figures, output='page.html', jobs=1, defer_hash=True) == 0
+    # (the page was not published, so it is built again)
+    assert build(figures, output='page.html', jobs=1, defer_hash=True) == 0
+    assert commit_hash() == 0
+    assert build(figures, output='page.html', jobs=1, defer_hash=True) == unchanged_exit_status
+    assert commit_hash() == 1
+
+
+def test_hash_changes_with_the_data(workdir, monkeypatch):
+    assert build(['scatter'], output='page.html', jobs=1) == 0
+    df_plot = course_table(pd.DataFrame(make_courses(20)))
+    df_plot['rating'] = np.clip(df_plot['rating'] + 0.01, 1, 5)
+    monkeypatch.setattr(pipeline, 'load_data', lambda *args, **kwargs: (df_plot, None, None, None))
+    assert build(['scatter'], output='page.html', jobs=1) == 0
@@ -0,0 +1,64 @@
+# The review-level export (see export.py): the reviews read back by load_reviews() from a few row groups of the export
+# against the reviews it was written from
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from omscs_dashboard import export
+from omscs_dashboard.clean import semester_ordinals
+from omscs_dashboard.export import write_export, load_reviews
+from omscs_dashboard.pipeline import course_table
+from omscs_dashboard.scrape import extract_reviews
+from synthetic import make_courses, make_reviews_html
+
+
+@pytest.fixture
+def exported(tmp_path, monkeypatch):
+    # (small row groups, so that the reviews of most courses span several of them and start within one)
+    monkeypatch.setattr(export, 'row_group_size', 7)
+    df_plot = course_table(pd.DataFrame(make_courses(8)))
+    reviews = {name: extract_reviews(make_reviews_html(10 + 4 * i, seed=i)) for i, name in enumerate(df_plot['name'])}
+    root = str(tmp_path / 'export')
+    write_export(df_plot, reviews, root)
+    return df_plot, reviews, root
+
+
+# The reviews of a course as (semester, rating, difficulty, workload) tuples, chronologically
+def review_tuples(df):
+    return list(zip(df['semester'].astype(str), df['rating'].astype(float), df['difficulty'].astype(float),
+                    df['workload'].astype(float)))
+
+
+def chronological(course_reviews):
+    ordinals = semester_ordinals([review[0] for review in course_reviews])
+    return [course_reviews[i] for i in sorted(range(len(course_reviews)), key=ordinals.__getitem__)]
+
+
+def test_exported_tables(exported):
+    df_plot, reviews, root = exported
+    for table_name in ['reviews', 'courses', 'course_index', 'course_semester_index', 'semester_index']:
+        df = pd.read_parquet(os.path.join(root, table_name + '.parquet'))
+        csv_df = pd.read_csv(os.path.join(root, table_name + '.csv.gz'))
+        assert list(csv_df.columns) == list(df.columns) and len(csv_df) == len(df)
+    reviews_file = pq.ParquetFile(os.path.join(root, 'reviews.parquet'))
+    assert reviews_file.metadata.num_rows == sum(len(course_reviews) for course_reviews in reviews.values())
+    assert reviews_file.num_row_groups > len(df_plot)
+    assert list(pd.read_parquet(os.path.join(root, 'courses.parquet'))['name']) == list(df_plot['name'])
+
+
+def test_load_reviews_of_a_course(exported):
+    df_plot, reviews, root = exported
+    for name in df_plot['name']:
+        assert review_tuples(load_reviews(name, root=root)) == chronological(reviews[name])
+    assert load_reviews('No such course', root=root).empty
+
+
+def test_load_reviews_of_a_course_in_a_semester(exported):
+    df_plot, reviews, root = exported
+    for name in df_plot['name']:
+        for semester in sorted({review[0] for review in reviews[name]}):
+            expected = [review for review in reviews[name] if review[0] == semester]
+            assert review_tuples(load_reviews(name, semester, root=root)) == expected
+        assert load_reviews(name, 'Fall 1999', root=root).empty
@@ -0,0 +1,127 @@
+# The HTTP layer (see fetch.py): the revalidation of the local copies of the pages, the retries, the counters, the
+# backoff and the rate limiting, against a local stub server
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from email.utils import formatdate
+import threading
+import time
+
+import pytest
+
+from omscs_dashboard import fetch
+from omscs_dashboard.fetch import backoff_delay, HostRateLimiter, fetch_url, FetchError
+
+
+body = b'<html>reviews</html>'
+etag = '"v1"'
+last_modified = formatdate(0, usegmt=True)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch, 'cache_dir', str(tmp_path / 'http_cache'))
+    monkeypatch.setattr(fetch, 'backoff_base', 0.01)
+    fetch.reset_stats()
+    requests = []  # (path, request headers) of every request
+    failures = {'/flaky': 1, '/down': 100}  # number of 503s left to answer on these paths
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append((self.path, dict(self.headers)))
+            if failures.get(self.path, 0) > 0:
+                failures[self.path] -= 1
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            if self.path == '/fresh':
+                self.send_header('Cache-Control', 'max-age=60')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d' % server.server_port, requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_unchanged_pages_are_revalidated(server):
+    base, requests = server
+    assert fetch_url(base + '/page') == body
+    assert fetch.stats['bytes_transferred'] == len(body)
+
+    # the second request sends the validators, and the page comes from the local copy after a 304 without a body
+    assert fetch_url(base + '/page') == body
+    assert requests[1][1]['If-None-Match'] == etag
+    assert requests[1][1]['If-Modified-Since'] == last_modified
+    assert fetch.stats['requests'] == 2
+    assert fetch.stats['not_modified'] == 1
+    assert fetch.stats['bytes_transferred'] == len(body)
+    assert fetch.stats['cache_hits'] == 0
+
+
+def test_fresh_pages_are_not_requested_again(server):
+    base, requests = server
+    assert fetch_url(base + '/fresh') == body
+    assert fetch_url(base + '/fresh') == body
+    assert len(requests) == 1
+    assert fetch.stats['cache_hits'] == 1
+
+
+def test_server_errors_are_retried(server, monkeypatch):
+    base, requests = server
+    assert fetch_url(base + '/flaky') == body
+    assert [path for path, _ in requests] == ['/flaky', '/flaky']
+    assert fetch.stats['retries'] == 1
+    assert fetch.stats['requests'] == 2
+
+    monkeypatch.setattr(fetch, 'max_retries', 2)
+    with pytest.raises(FetchError, match='HTTP 503'):
+        fetch_url(base + '/down')
+    assert [path for path, _ in requests].count('/down') == 3
+
+
+class Response:
+    def __init__(self, retry_after=None):
+        self.headers = {'Retry-After': retry_after} if retry_after is not None else {}
+
+
+def test_backoff_delay():
+    assert backoff_delay(0, Response('5')) == 5
+    # a long or far away Retry-After is capped, a past or invalid one gives the usual backoff
+    assert backoff_delay(0, Response('86400')) == fetch.backoff_max
+    assert backoff_delay(0, Response(formatdate(time.time() + 86400, usegmt=True))) == fetch.backoff_max
+    assert backoff_delay(0, Response(formatdate(time.time() - 60, usegmt=True))) == 0
+    for response in [None, Response(), Response('soon')]:
+        assert fetch.backoff_base * 0.5 <= backoff_delay(0, response) <= fetch.backoff_base
+        assert backoff_delay(20, response) <= fetch.backoff_max
+
+
+def test_rate_limiter_adapts():
+    url = 'https://www.omscentral.com/courses/a/reviews'
+    limiter = HostRateLimiter(4, 8)
+    for _ in range(100):
+        limiter.succeeded(url)
+    assert limiter.rate('www.omscentral.com') == 8
+    limiter.throttled(url)
+    assert limiter.rate('www.omscentral.com') == 4
+    # (at most one decrease per decrease_interval)
+    limiter.throttled(url)
+    assert limiter.rate('www.omscentral.com') == 4
+    # a throttled request delays the next one to the host by the delay asked for
+    limiter.throttled(url, 0.3)
+    started = time.monotonic()
+    limiter.wait(url)
+    assert time.monotonic() - started >= 0.25
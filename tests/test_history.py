@@ -0,0 +1,80 @@
+# The history store (see history.py): snapshots written over several days, the compaction of the past days and the
+# history of a course read back between two dates
+from datetime import datetime, timedelta, timezone
+import os
+
+import pandas as pd
+import pytest
+
+from omscs_dashboard.aggregate import metrics
+from omscs_dashboard.history import append_snapshot, load_course_history, compacted_name
+
+
+names = ['CS-6200 Graduate Introduction to Operating Systems', 'CSE-6040 Computing for Data Analysis']
+semesters = ['Fall 2022', 'Spring 2023']
+
+
+# The course table and the per-semester aggregates of run 'i' (the scores change from one run to the next)
+def snapshot_tables(i):
+    df_plot = pd.DataFrame({'name': names, 'tag': ['GIOS', 'CDA'], 'dept': ['CS', 'CSE'], 'code': ['CS-6200', 'CSE-6040'],
+                            'reviewCount': [100 + i, 50 + i]})
+    for j, metric in enumerate(metrics):
+        df_plot[metric] = [i + j + 0.5, i + j + 0.25]
+    index = pd.MultiIndex.from_product([names, semesters], names=['name', 'semester'])
+    semester_df = pd.DataFrame({'reviewCount': [10 + i] * len(index)}, index=index)
+    for metric in metrics:
+        semester_df[metric] = float(i)
+        semester_df[metric + '_var'] = 0.5
+        semester_df[metric + '_median'] = float(i)
+    return df_plot, semester_df
+
+
+# Three runs a day for three days
+snapshots = [datetime(2023, 5, 1, tzinfo=timezone.utc) + timedelta(days=day, hours=8 * run)
+             for day in range(3) for run in range(3)]
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = str(tmp_path / 'history')
+    for i, snapshot in enumerate(snapshots):
+        append_snapshot(*snapshot_tables(i), snapshot=snapshot, root=root)
+    return root
+
+
+def test_past_days_are_compacted(root):
+    for table_name in ['courses', 'semesters']:
+        partitions = sorted(os.listdir(os.path.join(root, table_name)))
+        assert partitions == ['date=2023-05-01', 'date=2023-05-02', 'date=2023-05-03']
+        # one file for each past day, the snapshots of the last day as they were written
+        for partition in partitions[:2]:
+            assert os.listdir(os.path.join(root, table_name, partition)) == [compacted_name]
+        assert sorted(os.listdir(os.path.join(root, table_name, partitions[2]))) == \
+            ['20230503T000000Z.arrow', '20230503T080000Z.arrow', '20230503T160000Z.arrow']
+
+
+def test_course_history(root):
+    df = load_course_history(names[1], root=root)
+    assert list(df['snapshot']) == [pd.Timestamp(snapshot) for snapshot in snapshots]
+    assert list(df['name']) == [names[1]] * len(snapshots)
+    assert list(df['reviewCount']) == [50 + i for i in range(len(snapshots))]
+    assert list(df['rating']) == [i + 0.25 for i in range(len(snapshots))]
+
+    df = load_course_history(names[0], 'semesters', root=root)
+    assert list(zip(df['snapshot'], df['semester'])) == [(pd.Timestamp(snapshot), semester) for snapshot in snapshots
+                                                         for semester in semesters]
+    assert list(df['reviewCount']) == [10 + i for i in range(len(snapshots)) for _ in semesters]
+
+
+def test_course_history_between_dates(root):
+    # from the second run of the first day to the first run of the last day, across the compacted days
+    start, end = snapshots[1], snapshots[6]
+    df = load_course_history(names[0], start=start, end=end, root=root)
+    assert list(df['snapshot']) == [pd.Timestamp(snapshot) for snapshot in snapshots[1:7]]
+    assert list(df['reviewCount']) == [100 + i for i in range(1, 7)]
+
+    df = load_course_history(names[0], 'semesters', start=start + timedelta(minutes=1), end=end, root=root)
+    assert list(df['snapshot'].unique()) == [pd.Timestamp(snapshot) for snapshot in snapshots[2:7]]
+
+    assert load_course_history(names[0], start=snapshots[-1] + timedelta(days=1), root=root).empty
+    assert load_course_history('No such course', root=root).empty
@@ -0,0 +1,23 @@
+# The per-stage metrics (see metrics.py)
+from omscs_dashboard import metrics
+
+
+def run(rows):
+    metrics.reset()
+    metrics.start_stage('parse')
+    metrics.add_rows(rows)
+    metrics.add_course(name='Course')
+    metrics.start_stage('aggregate')
+    metrics.add_rows(2 * rows)
+    return metrics.summary()
+
+
+def test_every_run_starts_from_zero():
+    run(10)
+    summary = run(7)
+    assert list(summary['stages']) == ['parse', 'aggregate']
+    assert summary['stages']['parse']['rows'] == 7
+    assert summary['stages']['aggregate']['rows'] == 14
+    assert len(summary['courses']) == 1
+    metrics.reset()
+    assert metrics.summary()['stages'] == {}
@@ -0,0 +1,37 @@
+# The single-pass review extractor against the BeautifulSoup reference implementation (see scrape.py)
+import pytest
+
+from omscs_dashboard.scrape import extract_reviews, extract_reviews_soup, info_class
+from synthetic import make_reviews_html
+
+
+def review_item(semester, *infos, extra=''):
+    return ('<li><span class="capitalize">' + semester + '</span>' + extra +
+            ''.join('<span class="' + info_class + '">' + info + '</span>' for info in infos) + '</li>')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_same_reviews_as_beautifulsoup(seed):
+    page = make_reviews_html(200, seed)
+    assert extract_reviews(page) == extract_reviews_soup(page)
+    assert extract_reviews(page.encode()) == extract_reviews(page)
+
+
+def test_edge_cases():
+    page = '<ul>' + ''.join([
+        review_item('fall 2020', 'Rating: 4 / 5', 'Difficulty: 3 / 5', 'Workload: 12 hours / week'),
+        # unknown semester, and missing or non-numeric scores
+        review_item('unknown semester', 'Rating: 4 / 5', 'Difficulty: 3 / 5', 'Workload: 12 hours / week'),
+        review_item('spring 2021', 'Rating: 4 / 5', 'Workload: 12 hours / week'),
+        review_item('summer 2021', 'Rating: 4.5 / 5', 'Difficulty: 3 / 5', 'Workload: 12 hours / week'),
+        # a nested span inside a badge, an entity, and other spans with the capitalize class after the semester
+        review_item('spring&#32;2022', 'Rating: <span>5</span> / 5', 'Difficulty: 2 / 5', 'Workload: 8 hours / week',
+                    extra='<span class="capitalize">anonymous</span>'),
+        review_item('fall 2022', 'Rating: 1 / 5', 'Difficulty: 5 / 5', 'Workload: 30 hours / week',
+                    extra='<span class="text-sm">posted</span>'),
+        # a list item without a review
+        '<li><a href="/">Home</a></li>',
+    ]) + '</ul>'
+    expected = [('Fall 2020', 4.0, 3.0, 12.0), ('Spring 2022', 5.0, 2.0, 8.0), ('Fall 2022', 1.0, 5.0, 30.0)]
+    assert extract_reviews_soup(page) == expected
+    assert extract_reviews(page) == expected
@@ -0,0 +1,126 @@
+# The serialization of the figures for the page (see render.py and pipeline.build_figures): the figures read back from
+# the page against the figures they were written from
+import hashlib
+import json
+import os
+import re
+
+import plotly.graph_objects as go
+import pytest
+
+from omscs_dashboard import pipeline
+from omscs_dashboard.figures import figure_groups
+from omscs_dashboard.pipeline import build_figures, write_page
+from omscs_dashboard.render import PageRenderer, figure_json
+
+
+@pytest.fixture
+def fixed_header(monkeypatch):
+    # (the header has the time of the build)
+    monkeypatch.setattr(pipeline, 'page_header', lambda: '<h1>Georgia Tech OMSCS</h1>')
+
+
+def test_parallel_and_serial_builds_are_the_same(data, fixed_header, tmp_path):
+    parts = build_figures(figure_groups, data, jobs=1)
+    assert build_figures(figure_groups, data, jobs=2) == parts
+    assert build_figures(figure_groups, data, jobs=len(figure_groups)) == parts
+
+    write_page(parts, str(tmp_path / 'serial.html'))
+    write_page(build_figures(figure_groups, data, jobs=2), str(tmp_path / 'parallel.html'))
+    assert (tmp_path / 'serial.html').read_bytes() == (tmp_path / 'parallel.html').read_bytes()
+
+
+# Python version of the omscsExpand() script of the page
+def expand(value, shared):
+    if isinstance(value, list):
+        return [expand(item, shared) for item in value]
+    if isinstance(value, dict):
+        if '$s' in value:
+            return expand(shared[value['$s']], shared)
+        return {key: expand(item, shared) for key, item in value.items()}
+    return value
+
+
+# The shared table of a page and the arguments of the omscsExpand() calls of each figure (data, layout and the frames
+# if any), as written in the page
+def page_figures(html):
+    decoder = json.JSONDecoder()
+    shared = decoder.raw_decode(html, html.index('var omscsShared=') + len('var omscsShared='))[0]
+    figures = []
+    for script in re.findall(r'<script>(Plotly\.newPlot\(.*?);</script>', html):
+        figures.append([decoder.raw_decode(script, match.end())[0] for match in re.finditer(r'omscsExpand\(', script)])
+    return shared, figures
+
+
+def render_page(figures, lazy_frames=False):
+    page = PageRenderer(lazy_frames=lazy_frames)
+    for figure in figures:
+        page.add_html('<h3>Figure</h3>')
+        page.add_figure_json(figure)
+    return page.render('page_frames')
+
+
+def test_expanded_figures_are_the_figures(data):
+    figures = [part for part in build_figures(figure_groups, data, jobs=1) if not isinstance(part, str)]
+    html, frame_files = render_page(figures)
+    shared, page = page_figures(html)
+    assert shared and not frame_files
+    assert len(page) == len(figures)
+    for figure, arguments in zip(figures, page):
+        assert [expand(argument, shared) for argument in arguments] == \
+            [figure['data'], figure['layout']] + ([figure['frames']] if figure.get('frames') else [])
+
+
+def test_arrays_shared_between_figures():
+    # the same array in two figures, and in a shared list of traces
+    names = ['Course %d' % i for i in range(40)]
+    traces = [go.Bar(x=names, y=list(range(40))), go.Scatter(x=names, y=[i / 3 for i in range(40)])]
+    figures = [figure_json(go.Figure(traces)), figure_json(go.Figure(traces, layout={'title': 'Other'})),
+               figure_json(go.Figure(go.Scatter(x=names, mode='markers')))]
+    html, frame_files = render_page(figures)
+    shared, page = page_figures(html)
+    assert html.count('"Course 39"') == 1
+    assert page[0][0] == page[1][0] and page[0][0] == {'$s': 0}
+    for figure, (figure_data, layout) in zip(figures, page):
+        assert expand(figure_data, shared) == figure['data']
+        assert expand(layout, shared) == figure['layout']
+
+
+def test_lazy_frames(data, fixed_header, tmp_path):
+    parts = build_figures(figure_groups, data, jobs=1)
+    figures = [part for part in parts if not isinstance(part, str)]
+    assert any(figure.get('frames') for figure in figures)
+    write_page(parts, str(tmp_path / 'page.html'))
+    write_page(parts, str(tmp_path / 'lazy.html'), lazy_frames=True)
+    html = (tmp_path / 'lazy.html').read_text(encoding='utf-8')
+    assert len(html) < len((tmp_path / 'page.html').read_text(encoding='utf-8'))
+
+    # the frame files are named after the hash of their content
+    frames_dir = tmp_path / 'lazy_frames'
+    frame_files = {name: (frames_dir / name).read_text(encoding='utf-8') for name in os.listdir(frames_dir)}
+    for name, text in frame_files.items():
+        assert name == hashlib.sha256(text.encode('utf-8')).hexdigest()[:16] + '.json'
+        assert text not in html
+
+    shared, page = page_figures(html)
+    frame_urls = [json.JSONDecoder().raw_decode(html, match.end())[0]
+                  for match in re.finditer(r'omscsLazyFrames\("[^"]+", ', html)]
+    animated = [(figure, arguments) for figure, arguments in zip(figures, page) if figure.get('frames')]
+    assert len(frame_urls) == len(animated)
+    for (figure, (figure_data, layout, frames)), urls in zip(animated, frame_urls):
+        # the page only has the names of the frames, and the frame files have the frames
+        assert expand(figure_data, shared) == figure['data']
+        assert expand(frames, shared) == [{'name': frame['name']} for frame in figure['frames']]
+        assert list(urls) == [frame['name'] for frame in figure['frames']]
+        assert [json.loads(frame_files[urls[frame['name']].split('/')[1]]) for frame in figure['frames']] == figure['frames']
+        assert all(url.startswith('lazy_frames/') for url in urls.values())
+
+        # the play button loads the frames before playing them, the other buttons are unchanged
+        layout = expand(layout, shared)
+        buttons = [button for menu in layout['updatemenus'] for button in menu['buttons']]
+        expected = [button for menu in figure['layout']['updatemenus'] for button in menu['buttons']]
+        assert [button['method'] for button in buttons] == ['skip' if button['args'][0] is None else button['method']
+                                                              for button in expected]
+        assert 'skip' in [button['method'] for button in buttons]
+        assert [dict(button, method=None) for button in buttons] == [dict(button, method=None) for button in expected]
+        assert dict(layout, updatemenus=None) == dict(figure['layout'], updatemenus=None)
@@ -0,0 +1,115 @@
+# The incremental rollups of the review scores (see rollups.py) against rollups computed from scratch and against pandas
+import numpy as np
+import pandas as pd
+
+from omscs_dashboard.aggregate import metrics, review_table
+from omscs_dashboard.clean import semester_ordinals, semester_names, sort_semesters
+from omscs_dashboard.rollups import update_rollups, rollup_table, rollup_keys
+from omscs_dashboard.state_store import open_state, load_rollups
+
+
+def make_reviews(n, seed):
+    rng = np.random.default_rng(seed)
+    semesters = ['Spring 2020', 'Summer 2020', 'Fall 2020', 'Spring 2021', 'Unknown Semester']
+    return [(semesters[rng.integers(len(semesters))], float(rng.integers(1, 6)), float(rng.integers(1, 6)),
+             float(rng.integers(3, 40))) for _ in range(n)]
+
+
+def sorted_cube(cube):
+    # (the 'all' rows have no department, None or NaN)
+    return cube.sort_values(rollup_keys).reset_index(drop=True).astype({'dept': object}).fillna({'dept': ''})
+
+
+# The rollups of a fresh state store, computed from all the reviews at once
+def from_scratch(reviews, depts):
+    return sorted_cube(update_rollups(open_state(':memory:'), reviews, depts))
+
+
+def test_incremental_updates_are_the_same_as_from_scratch():
+    reviews = {'Course %d' % i: make_reviews(n, seed=i) for i, n in enumerate([3, 10, 40, 25])}
+    depts = {'Course 0': 'CS', 'Course 1': 'CS', 'Course 2': 'ISYE', 'Course 3': 'CSE'}
+    state = open_state(':memory:')
+    update_rollups(state, reviews, depts)
+
+    # new reviews for a course, a course moved to another department, a new course and a course gone from the page
+    reviews['Course 1'] = reviews['Course 1'] + make_reviews(5, seed=10)
+    depts['Course 2'] = 'CS'
+    reviews['Course 4'] = make_reviews(8, seed=4)
+    depts['Course 4'] = 'CSE'
+    del reviews['Course 3'], depts['Course 3']
+
+    cube = sorted_cube(update_rollups(state, reviews, depts))
+    expected = from_scratch(reviews, depts)
+    pd.testing.assert_frame_equal(cube, expected)
+    # the state store has the same rows, and the department without courses left is gone
+    pd.testing.assert_frame_equal(sorted_cube(load_rollups(state)), expected)
+    assert 'ISYE' not in set(cube['key'])
+    assert 'Course 3' not in set(cube['key'])
+
+
+def test_reviews_moved_between_semesters_are_updated():
+    # the same totals for the course, but not per semester
+    depts = {'A': 'CS'}
+    state = open_state(':memory:')
+    update_rollups(state, {'A': [('Fall 2020', 4.0, 3.0, 10.0), ('Spring 2021', 2.0, 3.0, 10.0)]}, depts)
+    reviews = {'A': [('Fall 2020', 2.0, 3.0, 10.0), ('Spring 2021', 4.0, 3.0, 10.0)]}
+    cube = sorted_cube(update_rollups(state, reviews, depts))
+    pd.testing.assert_frame_equal(cube, from_scratch(reviews, depts))
+    pd.testing.assert_frame_equal(sorted_cube(load_rollups(state)), cube)
+    table = rollup_table(cube, 'course')
+    assert list(table['rating']) == [3.0, 2.0, 4.0]
+
+
+def test_updates_without_new_reviews():
+    reviews = {'A': make_reviews(10, seed=0), 'B': make_reviews(5, seed=1)}
+    depts = {'A': 'CS', 'B': 'ISYE'}
+    state = open_state(':memory:')
+    update_rollups(state, reviews, depts)
+
+    # a course gone from the page, and nothing else changed
+    del reviews['B'], depts['B']
+    cube = sorted_cube(update_rollups(state, reviews, depts))
+    pd.testing.assert_frame_equal(cube, from_scratch(reviews, depts))
+    # a new course without any review (e.g. its review page could not be fetched)
+    depts['C'] = 'CSE'
+    cube = sorted_cube(update_rollups(state, reviews, depts))
+    pd.testing.assert_frame_equal(cube, from_scratch(reviews, depts))
+    assert 'C' not in set(cube['key'])
+    # no reviews at all
+    assert update_rollups(open_state(':memory:'), {}, {'C': 'CSE'}).empty
+
+
+def test_rollup_table_is_the_same_as_pandas():
+    reviews = {'Course %d' % i: make_reviews(n, seed=i) for i, n in enumerate([1, 10, 40])}
+    depts = {'Course 0': 'CS', 'Course 1': 'CS', 'Course 2': 'ISYE'}
+    cube = update_rollups(open_state(':memory:'), reviews, depts)
+
+    df = pd.DataFrame([(depts[name], name, *review) for name, course_reviews in reviews.items() for review in course_reviews],
+                      columns=['dept', 'name', 'semester'] + metrics)
+    df['ordinal'] = semester_ordinals(df['semester'])
+    # (the all-time rows include the reviews of unknown semesters, the semester rows do not)
+    semesters = df[df['ordinal'] >= 0]
+    for level, key in [('course', 'name'), ('dept', 'dept')]:
+        grouped = pd.concat([df.assign(ordinal=-1), semesters]).groupby([key, 'ordinal'])
+        table = rollup_table(cube, level)
+        assert list(zip(table['key'], table['ordinal'])) == list(grouped.size().index)
+        assert list(table['semester']) == list(semester_names(table['ordinal']))
+        assert list(table['reviews']) == list(grouped.size())
+        for metric in metrics:
+            np.testing.assert_allclose(table[metric], grouped[metric].mean(), rtol=1e-12)
+            np.testing.assert_allclose(table[metric + '_std'], grouped[metric].std(), rtol=1e-9, equal_nan=True)
+
+
+def test_semester_ordinals():
+    semesters = ['Fall 2019', 'Spring 2020', 'Summer 2020', 'All', 'Unknown Semester', 'Fall 2019']
+    ordinals = semester_ordinals(semesters)
+    assert list(ordinals) == [2019 * 3 + 2, 2020 * 3, 2020 * 3 + 1, -1, -1, 2019 * 3 + 2]
+    assert list(semester_names(ordinals)) == ['Fall 2019', 'Spring 2020', 'Summer 2020', 'All', 'All', 'Fall 2019']
+    assert sort_semesters(['Fall 2020', 'Spring 2021', 'Summer 2020', 'Spring 2020']) == ['Spring 2020', 'Summer 2020', 'Fall 2020', 'Spring 2021']
+
+
+def test_no_semesters():
+    assert list(semester_ordinals([])) == []
+    assert list(semester_ordinals([None, None])) == [-1, -1]
+    assert sort_semesters([]) == []
+    assert review_table({}, ['A']).empty
@@ -0,0 +1,124 @@
+# The concurrent scrape against a local stub HTTP server standing in for OMS Central, which waits a fixed delay before
+# every response to mimic the network, and serves a different review page for every course
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import re
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from omscs_dashboard import fetch
+from omscs_dashboard.pipeline import semester_aggregates
+from omscs_dashboard.scrape import scrape_courses, extract_reviews
+from omscs_dashboard.state_store import open_state
+from synthetic import make_reviews_html
+
+
+delay = 0.15
+n_courses = 12
+n_reviews = 20
+
+# paths of the requests the stub server answered
+served = []
+
+
+@pytest.fixture
+def stub_server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            served.append(self.path)
+            time.sleep(delay * 4 if 'slow' in self.path else delay)
+            page = make_reviews_html(n_reviews, seed=int(re.search(r'course-(\d+)', self.path).group(1))).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d' % server.server_port
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch, 'cache_dir', str(tmp_path / 'http_cache'))
+
+
+def scrape(base, workers):
+    names = ['Course %d' % i for i in range(n_courses)]
+    urls = [base + '/courses/course-%d/reviews' % i for i in range(n_courses)]
+    reviews = {}
+    started = time.perf_counter()
+    df, failed = scrape_courses(names, urls, max_workers=workers, requests_per_second=None, reviews=reviews)
+    return df, failed, reviews, time.perf_counter() - started
+
+
+def test_concurrent_scrape_is_faster_and_keeps_the_order(stub_server, tmp_path, monkeypatch):
+    sequential_df, failed, sequential_reviews, sequential_seconds = scrape(stub_server, 1)
+    assert not failed
+    # (a new cache, so that the concurrent scrape fetches every page again)
+    monkeypatch.setattr(fetch, 'cache_dir', str(tmp_path / 'http_cache_2'))
+    concurrent_df, failed, concurrent_reviews, concurrent_seconds = scrape(stub_server, 8)
+    assert not failed
+
+    names = ['Course %d' % i for i in range(n_courses)]
+    assert list(concurrent_df.index.get_level_values('name').unique()) == names
+    assert concurrent_df.equals(sequential_df)
+    for i, name in enumerate(names):
+        assert concurrent_reviews[name] == extract_reviews(make_reviews_html(n_reviews, seed=i))
+
+    assert sequential_seconds >= n_courses * delay
+    assert concurrent_seconds < sequential_seconds / 3
+
+
+def test_failed_pages_are_reported(stub_server, monkeypatch):
+    monkeypatch.setattr(fetch, 'max_retries', 0)
+    names = ['Course 0', 'Missing', 'Course 1']
+    urls = [stub_server + '/courses/course-0/reviews', 'http://127.0.0.1:1/reviews', stub_server + '/courses/course-1/reviews']
+    df, failed = scrape_courses(names, urls, max_workers=4, requests_per_second=None)
+    assert failed == ['Missing']
+    assert list(df.index.get_level_values('name').unique()) == ['Course 0', 'Course 1']
+
+
+def test_courses_are_checkpointed_as_they_finish(stub_server):
+    # the first page is the slowest, so every other course is checkpointed before it but still comes first in the output
+    names = ['Course %d' % i for i in range(4)]
+    urls = [stub_server + '/courses/course-0/reviews?slow'] + [stub_server + '/courses/course-%d/reviews' % i for i in range(1, 4)]
+    checkpointed = []
+    df, failed = scrape_courses(names, urls, max_workers=4, requests_per_second=None,
+                                checkpoint=lambda name, course_reviews, course_df: checkpointed.append((name, course_df)))
+    assert not failed
+    assert checkpointed[-1][0] == 'Course 0'
+    assert sorted(name for name, course_df in checkpointed) == names
+    # each checkpoint gets the rows of its own course, as the scrape aggregated them
+    for name, course_df in checkpointed:
+        assert course_df.equals(df.loc[[name]])
+    assert list(df.index.get_level_values('name').unique()) == names
+
+
+def test_nothing_to_scrape():
+    df, failed = scrape_courses([], [])
+    assert df.empty and not failed
+
+
+def test_unchanged_courses_are_reused_from_the_state_store(stub_server, tmp_path):
+    # the second run against the same state file scrapes nothing, and gives the same aggregates
+    df_plot = pd.DataFrame({'name': ['Course %d' % i for i in range(3)], 'reviewCount': [n_reviews] * 3,
+                            'reviewsURL': [stub_server + '/courses/course-%d/reviews' % i for i in range(3)]})
+    results = []
+    for run in range(2):
+        served.clear()
+        state = open_state(str(tmp_path / 'state.sqlite'))
+        reviews = {}
+        results.append((semester_aggregates(df_plot, state, reviews, requests_per_second=None), reviews))
+        state.close()
+    assert not served
+    pd.testing.assert_frame_equal(results[1][0], results[0][0], check_dtype=False)
+    assert results[1][1] == results[0][1]
@@ -0,0 +1,96 @@
+# The filtered views of the dashboard server (see server.py): the figures restricted to the filters against the figures
+# built again on the filtered data, and the errors of the requests
+from http.server import ThreadingHTTPServer
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from omscs_dashboard.figures import figure_groups, figure_builders
+from omscs_dashboard.render import plain_json, compact, float_decimals
+from omscs_dashboard.server import Dashboard, DashboardHandler, figure_sources, filter_data, parse_filters
+
+
+@pytest.fixture(scope='module')
+def dashboard(data):
+    dashboard = Dashboard(figure_groups)
+    dashboard.data, dashboard.sources, dashboard.data_hash, dashboard.updated = data, figure_sources(figure_groups, data), 'hash', ''
+    return dashboard
+
+
+# The parts of a response, with the boxes of the treemaps sorted by id (their order does not matter)
+def figure_parts(parts):
+    for part in parts:
+        for trace in part['data'] if isinstance(part, dict) else []:
+            if trace['type'] == 'treemap':
+                order = sorted(range(len(trace['ids'])), key=trace['ids'].__getitem__)
+                for key in ['ids', 'parents', 'labels', 'values', 'customdata']:
+                    trace[key] = [trace[key][i] for i in order]
+                trace['marker']['colors'] = [trace['marker']['colors'][i] for i in order]
+    return parts
+
+
+def assert_same(value, expected, path=''):
+    if isinstance(expected, dict):
+        assert isinstance(value, dict) and sorted(value) == sorted(expected), path
+        for key in expected:
+            assert_same(value[key], expected[key], path + '.' + key)
+    elif isinstance(expected, list):
+        assert isinstance(value, list) and len(value) == len(expected), path
+        for i, (item, expected_item) in enumerate(zip(value, expected)):
+            assert_same(item, expected_item, path + '[%d]' % i)
+    elif isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        # (the restricted figures are computed from values rounded to float_decimals)
+        assert value == pytest.approx(expected, abs=2 * 10 ** -float_decimals), path
+    else:
+        assert value == expected, path
+
+
+@pytest.mark.parametrize('query', ['dept=CS', 'dept=CS,CSE&min_reviews=40', 'from=Fall 2017&to=Spring 2020',
+                                   'dept=ISYE&from=Summer 2016', 'min_reviews=80'])
+@pytest.mark.parametrize('group', figure_groups)
+def test_filtered_figures_are_the_figures_of_the_filtered_data(dashboard, data, group, query):
+    filters = parse_filters(query)
+    filtered = filter_data(data, filters)
+    assert not filtered['df_plot'].empty and not filtered['df_plot_semester'].empty
+    response = dashboard.build_response('/api/figures/' + group, filters, data, dashboard.sources, '', '"etag"')
+    expected = [part if isinstance(part, str) else compact(plain_json(part), float_decimals)
+                for part in figure_builders[group](filtered)]
+    assert_same(figure_parts(json.loads(response.body)), figure_parts(expected))
+
+
+def test_unfiltered_figures(dashboard, data):
+    for group in figure_groups:
+        response = dashboard.build_response('/api/figures/' + group, {}, data, dashboard.sources, '', '"etag"')
+        assert json.loads(response.body) == dashboard.sources[group]
+
+
+def test_request_errors(dashboard, monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), type('Handler', (DashboardHandler,), {'dashboard': dashboard}))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = 'http://127.0.0.1:%d' % server.server_port
+
+    def status(path):
+        try:
+            with urllib.request.urlopen(base + path) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    try:
+        assert status('/api/figures/scatter?dept=CS') == 200
+        assert status('/api/figures/scatter?min_reviews=many') == 400
+        assert status('/api/figures/other') == 404
+
+        # any other error while building a response is a 500, and the server keeps serving
+        def fail(*args):
+            raise RuntimeError('broken figure')
+        monkeypatch.setattr(dashboard, 'build_response', fail)
+        assert status('/api/figures/scatter?dept=CSE') == 500
+        monkeypatch.undo()
+        assert status('/api/figures/scatter?dept=CSE') == 200
+    finally:
+        server.shutdown()
+        server.server_close()
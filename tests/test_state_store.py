@@ -0,0 +1,62 @@
+# The reuse of the courses whose review count did not change from the state store (see state_store.py and
+# pipeline.semester_aggregates), on the pages of a replay archive of synthetic OMS Central data
+import pandas as pd
+import pytest
+
+from omscs_dashboard import fetch
+from omscs_dashboard.pipeline import load_data
+from omscs_dashboard.state_store import open_state, content_hash
+from bench_pipeline import write_archive
+
+
+n_courses = 12
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = str(tmp_path / 'pages.zip')
+    write_archive(path, n_courses, 15)
+    fetch.replay_from(path)
+    yield path
+    fetch.close_archive()
+
+
+# Load the data with the state store at 'state_path', returns the tables, their hash and the number of pages read
+def run(state_path):
+    fetch.reset_stats()
+    state = open_state(state_path)
+    try:
+        df_plot, semester_df, reviews, cube = load_data(['scatter', 'semester'], state, replay=True)
+    finally:
+        state.close()
+    return df_plot, semester_df, reviews, content_hash(df_plot, semester_df), fetch.stats['replayed']
+
+
+def test_unchanged_courses_are_not_scraped_again(archive, tmp_path):
+    state_path = str(tmp_path / 'state.sqlite')
+    df_plot, semester_df, reviews, data_hash, pages = run(state_path)
+    # the landing page and the review page of every course
+    assert pages == 1 + len(df_plot)
+    assert set(semester_df.index.get_level_values('name')) == set(df_plot['name'])
+
+    # the second run only reads the landing page, and gives the same aggregates, reviews and hash
+    df_plot_2, semester_df_2, reviews_2, data_hash_2, pages = run(state_path)
+    assert pages == 1
+    pd.testing.assert_frame_equal(semester_df_2, semester_df, check_dtype=False)
+    assert reviews_2 == reviews
+    assert data_hash_2 == data_hash
+
+
+def test_changed_courses_are_scraped_again(archive, tmp_path):
+    state_path = str(tmp_path / 'state.sqlite')
+    df_plot, semester_df, reviews, data_hash, pages = run(state_path)
+    # (a review count that is not the one of OMS Central any more)
+    state = open_state(state_path)
+    with state:
+        state.execute('UPDATE courses SET review_count = review_count + 1 WHERE name = ?', (df_plot['name'].iloc[0],))
+    state.close()
+
+    df_plot_2, semester_df_2, reviews_2, data_hash_2, pages = run(state_path)
+    assert pages == 2
+    pd.testing.assert_frame_equal(semester_df_2, semester_df, check_dtype=False)
+    assert data_hash_2 == data_hash